@@ -1,6 +1,68 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, UserKey, VaultItem, VaultCollection
+from django.db import transaction
+from .models import User, UserKey, VaultItem, VaultCollection, VaultTombstone
+
+
+# Saves an inline formset of a user's VaultItems or VaultCollections as the API views would: what
+# it writes is stamped with the user's next vault_version and what it deletes leaves tombstones
+def save_vault_formset(formset, user_id):
+    if not formset.has_changed():
+        return formset.save()
+
+    vault_version = User.objects.next_vault_version(user_id)
+    instances = formset.save(commit=False)
+    for obj in formset.deleted_objects:
+        VaultTombstone.objects.record(obj, user_id, vault_version)
+        obj.delete()
+    for obj in instances:
+        obj.vault_version = vault_version
+        obj.save()
+    formset.save_m2m()
+    return instances
+
+
+class VaultVersionAdminMixin:
+    # Stamps what an admin edit writes with the owner's next vault_version and leaves tombstones
+    # for what it deletes, as the API views do, so sync clients see admin changes too. An object
+    # moved to another user also leaves tombstones in the previous owner's vault.
+    # Used by the VaultCollection and VaultItem admins.
+
+    # The owner of obj as edited, before it is saved
+    def get_vault_user_id(self, obj):
+        return obj.user_id
+
+    def save_model(self, request, obj, form, change):
+        user_id = self.get_vault_user_id(obj)
+        with transaction.atomic():
+            if change:
+                previous = self.model.objects.get(pk=obj.pk)
+                if previous.user_id != user_id:
+                    VaultTombstone.objects.record(
+                        previous, previous.user_id,
+                        User.objects.next_vault_version(previous.user_id))
+            obj.vault_version = User.objects.next_vault_version(user_id)
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            VaultTombstone.objects.record(obj, obj.user_id,
+                                          User.objects.next_vault_version(obj.user_id))
+            super().delete_model(request, obj)
+
+    # Admin actions do not run in a transaction of their own
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for obj in queryset:
+                VaultTombstone.objects.record(obj, obj.user_id,
+                                              User.objects.next_vault_version(obj.user_id))
+            super().delete_queryset(request, queryset)
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is VaultItem:
+            save_vault_formset(formset, form.instance.user_id)
+        else:
+            super().save_formset(request, form, formset, change)
 
 
 class UserKeyInline(admin.TabularInline):
@@ -40,6 +102,12 @@ class UserAdmin(BaseUserAdmin):
     ordering = ('email',)
     inlines = (UserKeyInline, VaultCollectionInline,)
 
+    def save_formset(self, request, form, formset, change):
+        if formset.model is VaultCollection:
+            save_vault_formset(formset, form.instance.pk)
+        else:
+            super().save_formset(request, form, formset, change)
+
 
 class UserKeyAdmin(admin.ModelAdmin):
     ordering = ('user',)
@@ -47,19 +115,29 @@ class UserKeyAdmin(admin.ModelAdmin):
     list_display = ('user', 'encrypted_symmetric_key', 'created_at', 'modified_at',)
 
 
-class VaultCollectionAdmin(admin.ModelAdmin):
+class VaultCollectionAdmin(VaultVersionAdminMixin, admin.ModelAdmin):
     ordering = ('name',)
     search_fields = ('name',)
     list_display = ('name', 'uuid',)
     inlines = (VaultItemInline,)
 
 
-class VaultItemAdmin(admin.ModelAdmin):
+class VaultItemAdmin(VaultVersionAdminMixin, admin.ModelAdmin):
     ordering = ('modified_at',)
     list_display = ('encrypted_data', 'uuid', 'created_at', 'modified_at',)
 
+    def get_vault_user_id(self, obj):
+        return obj.vault_collection.user_id
+
+
+class VaultTombstoneAdmin(admin.ModelAdmin):
+    ordering = ('-deleted_at',)
+    list_display = ('user', 'kind', 'uuid', 'deleted_at',)
+    list_filter = ('kind',)
+
 
 admin.site.register(User, UserAdmin)
 admin.site.register(UserKey, UserKeyAdmin)
 admin.site.register(VaultCollection, VaultCollectionAdmin)
 admin.site.register(VaultItem, VaultItemAdmin)
+admin.site.register(VaultTombstone, VaultTombstoneAdmin)
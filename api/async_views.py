@@ -0,0 +1,150 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, \
+    get_user, get_user_model, load_backend
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+
+from .etags import get_vault_etag
+from .renderers import ORJSONRenderer
+from .serializers import UserKeySerializer, VaultCollectionSerializer, VaultItemReadSerializer
+from .user_key_cache import get_user_key_cache
+from .views import UserKeyAPIView, VaultCollectionViewSet, VaultItemViewSet
+
+from api.models import VaultCollection, VaultItem
+from config.metrics import measure_serialization
+
+# Native async versions of the hot GET endpoints, mounted in place of the DRF views when
+# ASYNC_READ_VIEWS is on. Under ASGI a DRF view runs in a worker thread; these run on the
+# event loop and only leave it for the session load. Every other method, and paginated list
+# requests, are handed to the DRF view so the responses stay identical.
+
+NOT_AUTHENTICATED = 'Authentication credentials were not provided.'
+
+
+def json_response(data, status=200):
+    return HttpResponse(ORJSONRenderer().render(data), status=status,
+                        content_type='application/json')
+
+
+# Same result as django.contrib.auth.get_user() for the common case of a valid session.
+# Session backends have no async API in Django 4.2, so loading the session is the one
+# step that runs in a thread; the user itself is fetched with the async ORM.
+async def aget_user(request):
+    user_id = await sync_to_async(request.session.get)(SESSION_KEY)
+    backend_path = request.session.get(BACKEND_SESSION_KEY)
+    if user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    backend = load_backend(backend_path)
+    if not isinstance(backend, ModelBackend):
+        return await sync_to_async(get_user)(request)
+
+    UserModel = get_user_model()
+    user = await UserModel._default_manager.filter(
+        pk=UserModel._meta.pk.to_python(user_id)).afirst()
+    if user is None or not backend.user_can_authenticate(user):
+        return AnonymousUser()
+
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+        return user
+    # Sessions signed with a fallback secret are rotated and stale ones are flushed, both of
+    # which write to the session, so leave them to Django
+    return await sync_to_async(get_user)(request)
+
+
+# Serves GET requests the handler can answer from the async view and hands everything else to
+# the DRF view. The DRF view enforces CSRF for writes itself, as it does when routed directly.
+def async_read_view(sync_view, can_handle=lambda request: True):
+    sync_view = sync_to_async(sync_view)
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET' or not can_handle(request):
+                return await sync_view(request, *args, **kwargs)
+
+            request.user = await aget_user(request)
+            if not request.user.is_authenticated:
+                return json_response({'detail': NOT_AUTHENTICATED}, status=403)
+            return await handler(request, *args, **kwargs)
+
+        view.csrf_exempt = True
+        return view
+
+    return decorator
+
+
+# Async counterpart of conditional_vault_list
+def async_conditional_vault_list(handler):
+    @wraps(handler)
+    async def wrapper(request, *args, **kwargs):
+        etag = get_vault_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
+
+
+# Pages and expanded collections are served by the DRF views, which own the keyset pagination
+# and the ?include= handling
+def plain_list(request):
+    return not {'cursor', 'page_size', 'include'} & request.GET.keys()
+
+
+@async_read_view(UserKeyAPIView.as_view())
+async def user_key(request):
+    user_key = await get_user_key_cache().aget(request.user.id)
+    if user_key is None:
+        return json_response({'detail': "User's symmetric key not found"}, status=403)
+
+    return json_response(UserKeySerializer(user_key).data)
+
+
+@async_read_view(VaultItemViewSet.as_view({'get': 'list', 'post': 'create'},
+                                          basename='vault_item', detail=False),
+                 can_handle=plain_list)
+@async_conditional_vault_list
+async def vault_item_list(request):
+    vault_items = VaultItem.objects.filter(user_id=request.user.id).values(
+        *VaultItemReadSerializer.values)
+    serializer = VaultItemReadSerializer()
+    with measure_serialization():
+        data = [serializer.to_representation(vault_item) async for vault_item in vault_items]
+    return json_response({item['uuid']: item for item in data})
+
+
+@async_read_view(VaultItemViewSet.as_view({'get': 'retrieve', 'put': 'update',
+                                           'patch': 'partial_update', 'delete': 'destroy'},
+                                          basename='vault_item', detail=True))
+async def vault_item_detail(request, uuid):
+    try:
+        vault_item = await VaultItem.objects.values(*VaultItemReadSerializer.values).aget(
+            user_id=request.user.id, uuid=uuid)
+    except (VaultItem.DoesNotExist, DjangoValidationError):
+        return json_response({'detail': 'Not found.'}, status=404)
+
+    with measure_serialization():
+        data = VaultItemReadSerializer().to_representation(vault_item)
+    return json_response(data)
+
+
+@async_read_view(VaultCollectionViewSet.as_view({'get': 'list', 'post': 'create'},
+                                                basename='vault_collection', detail=False),
+                 can_handle=plain_list)
+@async_conditional_vault_list
+async def vault_collection_list(request):
+    vault_collections = [vault_collection async for vault_collection
+                         in VaultCollection.objects.filter(user_id=request.user.id)]
+    return json_response(VaultCollectionSerializer(vault_collections, many=True).data)
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+
+from .hashing_pool import run_in_hashing_pool
+
+
+class PooledModelBackend(ModelBackend):
+    # ModelBackend with the password hashing moved onto the bounded hashing pool.
+    # User lookups and the rehash-on-login save stay on the request thread.
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so an unknown email takes as long as a wrong password
+            run_in_hashing_pool(make_password, password)
+        else:
+            if self.check_password(user, password) and self.user_can_authenticate(user):
+                return user
+
+    # Same as User.check_password(), including upgrading the stored hash when the configured
+    # hasher or its parameters changed
+    def check_password(self, user, raw_password):
+        needs_rehash = []
+        is_correct = run_in_hashing_pool(check_password, raw_password, user.password,
+                                         needs_rehash.append)
+        if is_correct and needs_rehash:
+            user.password = run_in_hashing_pool(make_password, raw_password)
+            user.save(update_fields=['password'])
+        return is_correct
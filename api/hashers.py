@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    # Argon2id with its cost parameters read from settings so they can be sized per deployment.
+    # Stored hashes keep the "argon2" prefix, and any hash made with other parameters reports
+    # must_update(), so it is rehashed the next time its owner logs in.
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    # PBKDF2-SHA256 with its iteration count read from settings, for deployments without argon2-cffi
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
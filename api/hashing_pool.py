@@ -0,0 +1,76 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from rest_framework.exceptions import APIException
+
+
+class HashingPoolSaturated(APIException):
+    status_code = 503
+    default_detail = 'Too many logins are being processed, please try again shortly.'
+    default_code = 'hashing_pool_saturated'
+
+
+class HashingPool:
+    # Runs password hashing on a fixed number of threads so a burst of logins or signups
+    # cannot take every CPU core from the workers serving vault reads. Hashers release the
+    # GIL while hashing, so the threads do run in parallel. Once every worker is busy and
+    # `queue_depth` calls are waiting, further calls fail fast with a 503 instead of queueing.
+
+    def __init__(self, workers, queue_depth, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is only freed once the hash is done, even if the caller gave up waiting
+        future.add_done_callback(lambda future: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingPoolSaturated()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(settings.PASSWORD_HASHING_WORKERS,
+                                    settings.PASSWORD_HASHING_QUEUE_DEPTH,
+                                    settings.PASSWORD_HASHING_TIMEOUT)
+    return _pool
+
+
+# Hashing must never touch the database: the pool threads hold their own connections,
+# outside the request's transaction
+def run_in_hashing_pool(fn, *args):
+    return get_hashing_pool().run(fn, *args)
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(setting, **kwargs):
+    global _pool
+    if setting.startswith('PASSWORD_HASHING_') and _pool is not None:
+        with _pool_lock:
+            _pool.shutdown()
+            _pool = None
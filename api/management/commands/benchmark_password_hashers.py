@@ -0,0 +1,44 @@
+from time import perf_counter
+
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Reports single-core hashes per second for the configured password hashers ' \
+           'so login and signup capacity can be sized.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3.0,
+                            help='Time spent hashing with each hasher.')
+        parser.add_argument('--all', action='store_true',
+                            help='Benchmark every configured hasher rather than only the default.')
+
+    def handle(self, *args, **options):
+        hashers = get_hashers() if options['all'] else [get_hasher('default')]
+        for hasher in hashers:
+            try:
+                salt = hasher.salt()
+                hasher.encode('benchmark-password', salt)
+            except ValueError as exc:
+                # Raised by hashers whose optional library is not installed
+                self.stdout.write(f'{hasher.algorithm:<16} skipped: {exc}')
+                continue
+
+            hashes = 0
+            start = perf_counter()
+            while perf_counter() - start < options['seconds']:
+                hasher.encode('benchmark-password', salt)
+                hashes += 1
+            elapsed = perf_counter() - start
+
+            parameters = ', '.join(f'{key}={value}' for key, value in self.parameters(hasher).items())
+            self.stdout.write(
+                f'{hasher.algorithm:<16} {hashes / elapsed:8.1f} hashes/s/core  '
+                f'{elapsed / hashes * 1000:8.1f} ms/hash  ({parameters})'
+            )
+
+    def parameters(self, hasher):
+        names = ['iterations', 'time_cost', 'memory_cost', 'parallelism', 'rounds', 'work_factor',
+                 'block_size', 'maxmem']
+        return {name: getattr(hasher, name) for name in names if hasattr(hasher, name)}
@@ -0,0 +1,77 @@
+import io
+import tracemalloc
+import uuid
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Compares DRF\'s JSON renderer and parser with the orjson ones on synthetic vaults ' \
+           'in the vault_items list format. No database access.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Vault sizes to benchmark.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per vault size, the fastest is reported.')
+        parser.add_argument('--data-size', type=int, default=500,
+                            help='Length of each item\'s encrypted_data.')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write('orjson is not installed, both renderers would use the json module')
+            return
+
+        for items in options['items']:
+            data = self.vault(items, options['data_size'])
+            body = JSONRenderer().render(data)
+            if ORJSONRenderer().render(data) != body:
+                self.stderr.write(f'{items} items: rendered output differs')
+            self.stdout.write(f'{items} items, {len(body) / 1024 / 1024:.1f} MiB')
+
+            for name, renderer in [('json', JSONRenderer()), ('orjson', ORJSONRenderer())]:
+                self.report(f'render {name}', options['repeat'], renderer.render, data)
+            for name, parser in [('json', JSONParser()), ('orjson', ORJSONParser())]:
+                self.report(f'parse {name}', options['repeat'],
+                            lambda: parser.parse(io.BytesIO(body), parser_context={}))
+
+    # Same shape and value types as the serialized output of VaultItemViewSet.list
+    def vault(self, items, data_size):
+        vault_collection = str(uuid.uuid4())
+        now = timezone.now()
+        data = {}
+        for i in range(items):
+            item_uuid = str(uuid.uuid4())
+            data[item_uuid] = {
+                'encrypted_data': (f'{i}:' + 'U2FsdGVkX1+' * data_size)[:data_size],
+                'uuid': item_uuid,
+                'vault_collection': vault_collection,
+                'vault_collection_name': 'Default',
+                'created_at': now.isoformat().replace('+00:00', 'Z'),
+                'modified_at': now.isoformat().replace('+00:00', 'Z'),
+            }
+        return data
+
+    def report(self, name, repeat, function, *args):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            function(*args)
+            timings.append((perf_counter() - start) * 1000)
+
+        # A separate, untimed run as tracing allocations slows everything down
+        tracemalloc.start()
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f'  {name:<14} {min(timings):9.1f} ms  peak memory {peak / 1024 / 1024:7.1f} MiB')
@@ -0,0 +1,75 @@
+import statistics
+import uuid
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from api.models import VaultCollection, VaultItem
+
+
+class Command(BaseCommand):
+    help = 'Compares session engines on the vault_items list and retrieve endpoints. ' \
+           'All benchmark data is created inside a transaction that is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests timed per engine and endpoint.')
+        parser.add_argument('--items', type=int, default=100,
+                            help='Vault items in the benchmark vault.')
+        parser.add_argument('--engines', nargs='+', default=[
+            'django.contrib.sessions.backends.db',
+            'django.contrib.sessions.backends.cached_db',
+        ], help='Session engines to compare.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = get_user_model()(email=f'session-benchmark-{uuid.uuid4()}@example.com')
+            user.set_unusable_password()
+            user.save()
+            vault_collection = VaultCollection.objects.create(name='benchmark', user=user)
+            vault_items = VaultItem.objects.bulk_create([
+                VaultItem(encrypted_data=f'encrypted data {i}', vault_collection=vault_collection)
+                for i in range(options['items'])
+            ])
+            urls = {
+                'vault_item-list': reverse('vault_item-list'),
+                'vault_item-detail': reverse('vault_item-detail',
+                                             kwargs={'uuid': vault_items[0].uuid}),
+            }
+
+            for engine in options['engines']:
+                with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['testserver']):
+                    client = Client()
+                    client.force_login(user)
+                    for name, url in urls.items():
+                        self.benchmark(engine, name, client, url, options['requests'])
+                    # Removes the session from the cache as well as the rolled back table
+                    client.logout()
+
+            transaction.set_rollback(True)
+
+    def benchmark(self, engine, name, client, url, requests):
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        total_queries = len(queries.captured_queries)
+        session_queries = sum('django_session' in query['sql'] for query in queries.captured_queries)
+
+        timings = []
+        for _ in range(requests):
+            start = perf_counter()
+            client.get(url)
+            timings.append((perf_counter() - start) * 1000)
+        timings.sort()
+
+        self.stdout.write(
+            f'{engine:<45} {name:<18} '
+            f'mean {statistics.mean(timings):7.2f} ms  '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms  '
+            f'queries {total_queries} (session {session_queries})'
+        )
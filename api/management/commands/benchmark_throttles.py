@@ -0,0 +1,58 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import AnonRateThrottle
+
+from api.throttling import IPRateThrottle
+
+
+class Command(BaseCommand):
+    help = 'Measures the per-request cost of the sliding window throttle against DRF\'s ' \
+           'timestamp history throttle, both on THROTTLE_CACHE_ALIAS. Uses throwaway keys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Requests timed per throttle and rate.')
+        parser.add_argument('--rates', nargs='+', default=['10/m', '1000/h', '100000/d'],
+                            help='Rates to benchmark. The history throttle keeps one timestamp '
+                                 'per allowed request, so its cost grows with the rate.')
+
+    def handle(self, *args, **options):
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        request = APIRequestFactory().post('/login/', REMOTE_ADDR='203.0.113.1')
+        request.user = AnonymousUser()
+
+        for rate in options['rates']:
+            for name, throttle_class in [('history', AnonRateThrottle),
+                                         ('sliding window', IPRateThrottle)]:
+                throttle_class = type('BenchmarkThrottle', (throttle_class,), {
+                    'rate': rate, 'scope': 'benchmark', 'cache': cache})
+                timings, allowed = self.benchmark(throttle_class, request, options['requests'])
+                timings.sort()
+                self.stdout.write(
+                    f'{rate:<10} {name:<15} '
+                    f'mean {sum(timings) / len(timings):8.1f} us  '
+                    f'p99 {timings[int(len(timings) * 0.99) - 1]:8.1f} us  '
+                    f'allowed {allowed}/{len(timings)}'
+                )
+                cache.delete_many(self.keys(throttle_class(), request))
+
+    def benchmark(self, throttle_class, request, requests):
+        timings = []
+        allowed = 0
+        for _ in range(requests):
+            start = perf_counter()
+            throttle = throttle_class()
+            allowed += throttle.allow_request(request, None)
+            timings.append((perf_counter() - start) * 1000000)
+        return timings, allowed
+
+    def keys(self, throttle, request):
+        key = throttle.get_cache_key(request, None)
+        window = int(throttle.timer() // throttle.duration)
+        return [key, f'{key}_{window}', f'{key}_{window - 1}']
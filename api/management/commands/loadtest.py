@@ -0,0 +1,84 @@
+import statistics
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from threading import local
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from api.models import UserKey, VaultCollection, VaultItem
+
+
+class Command(BaseCommand):
+    help = 'Load tests the vault read endpoints of a running server, e.g. gunicorn serving ' \
+           'config.wsgi:application against uvicorn serving config.asgi:application. ' \
+           'Creates a throwaway user with a vault and deletes it afterwards. The server must ' \
+           'use the same database and session store as this command.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Base URL of the server, e.g. http://localhost:8000')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests sent per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Requests in flight at once.')
+        parser.add_argument('--items', type=int, default=100,
+                            help='Vault items in the load test vault.')
+
+    def handle(self, *args, **options):
+        user = get_user_model()(email=f'loadtest-{uuid.uuid4()}@example.com')
+        user.set_unusable_password()
+        user.save()
+        try:
+            UserKey.objects.create(user=user, encrypted_symmetric_key='loadtest')
+            vault_collection = VaultCollection.objects.create(name='loadtest', user=user)
+            vault_items = VaultItem.objects.bulk_create([
+                VaultItem(encrypted_data=f'encrypted data {i}', vault_collection=vault_collection)
+                for i in range(options['items'])
+            ])
+            client = Client()
+            client.force_login(user)
+            cookie = f'{settings.SESSION_COOKIE_NAME}=' \
+                     f'{client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+            for url in [reverse('user_key'), reverse('vault_item-list'),
+                        reverse('vault_item-detail', kwargs={'uuid': vault_items[0].uuid}),
+                        reverse('vault_collection-list')]:
+                self.load_test(options['url'], url, cookie,
+                               options['requests'], options['concurrency'])
+        finally:
+            user.delete()
+
+    def load_test(self, base_url, url, cookie, requests, concurrency):
+        server = urlsplit(base_url)
+        connections = local()
+
+        # One keep-alive connection per thread, as a client behind a load balancer would have
+        def get(_):
+            if not hasattr(connections, 'connection'):
+                connections.connection = HTTPConnection(server.hostname, server.port or 80)
+            start = perf_counter()
+            connections.connection.request('GET', url, headers={'Cookie': cookie})
+            response = connections.connection.getresponse()
+            response.read()
+            if response.status != 200:
+                raise RuntimeError(f'GET {url} returned {response.status}')
+            return (perf_counter() - start) * 1000
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(get, range(concurrency)))  # warm up the connections
+            start = perf_counter()
+            timings = sorted(executor.map(get, range(requests)))
+            elapsed = perf_counter() - start
+
+        self.stdout.write(
+            f'{url:<52} '
+            f'{requests / elapsed:8.1f} req/s  '
+            f'mean {statistics.mean(timings):7.2f} ms  '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms'
+        )
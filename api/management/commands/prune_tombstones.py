@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Greatest
+
+from api.models import VaultTombstone, get_tombstone_cutoff
+
+
+class Command(BaseCommand):
+    help = (f'Deletes the tombstones of vault deletions older than VAULT_TOMBSTONE_RETENTION_DAYS '
+            f'(currently {settings.VAULT_TOMBSTONE_RETENTION_DAYS}).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Number of tombstones deleted per statement.')
+
+    def handle(self, *args, **options):
+        expired = VaultTombstone.objects.filter(deleted_at__lt=get_tombstone_cutoff())
+        pruned = 0
+        while True:
+            # Short transactions, so deleting a large backlog does not hold locks for long
+            batch = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                tombstones = VaultTombstone.objects.filter(pk__in=batch)
+                # Sync cursors from before these deletions are refused from now on
+                for user_id, vault_version in tombstones.values('user_id').annotate(
+                        Max('vault_version')).values_list('user_id', 'vault_version__max'):
+                    get_user_model().objects.filter(pk=user_id).update(
+                        pruned_vault_version=Greatest('pruned_vault_version', vault_version))
+                pruned += tombstones.delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} tombstones.'))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import KEY_PREFIX, SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Copies unexpired database sessions into the cache used by the cached_db session engine.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of sessions fetched from the database per round trip.')
+
+    def handle(self, *args, **options):
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        store = SessionStore()
+        now = timezone.now()
+        warmed = 0
+
+        sessions = Session.objects.filter(expire_date__gt=now)
+        for session in sessions.iterator(chunk_size=options['chunk_size']):
+            # Cache entries expire together with the database row, as cached_db does itself
+            timeout = int((session.expire_date - now).total_seconds())
+            cache.set(KEY_PREFIX + session.session_key, store.decode(session.session_data), timeout)
+            warmed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Warmed {warmed} sessions in the session cache.'))
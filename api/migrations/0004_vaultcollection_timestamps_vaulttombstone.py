@@ -0,0 +1,45 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_vaultcollection_uuid_alter_vaultitem_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vaultcollection',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='vaultcollection',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='vaultitem',
+            name='vault_collection',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vault_items', to='api.vaultcollection'),
+        ),
+        migrations.CreateModel(
+            name='VaultTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('vault_item', 'Vault item'), ('vault_collection', 'Vault collection')], max_length=16)),
+                ('uuid', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'deleted_at'], name='vault_tombstone_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.6 on 2026-10-18 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_owners(apps, schema_editor):
+    VaultCollection = apps.get_model('api', 'VaultCollection')
+    VaultItem = apps.get_model('api', 'VaultItem')
+    VaultItem.objects.update(user_id=models.Subquery(
+        VaultCollection.objects.filter(pk=models.OuterRef('vault_collection_id')).values('user_id')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_vaultcollection_timestamps_vaulttombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vaultitem',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False, null=True,
+                                    on_delete=django.db.models.deletion.CASCADE,
+                                    to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_owners, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vaultitem',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False,
+                                    on_delete=django.db.models.deletion.CASCADE,
+                                    to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='vaultitem',
+            index=models.Index(fields=['user', 'modified_at', 'id'],
+                               name='vault_item_user_modified_idx'),
+        ),
+    ]
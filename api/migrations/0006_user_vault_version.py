@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_vaultitem_user_modified_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='vault_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.6 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_user_vault_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vaulttombstone',
+            name='vault_tombstone_user_idx',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='pruned_vault_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vaultcollection',
+            name='vault_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vaultitem',
+            name='vault_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vaulttombstone',
+            name='vault_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='vaultcollection',
+            index=models.Index(fields=['user', 'vault_version'], name='vault_collection_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaultitem',
+            index=models.Index(fields=['user', 'vault_version'], name='vault_item_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaulttombstone',
+            index=models.Index(fields=['user', 'vault_version'], name='vault_tombstone_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaulttombstone',
+            index=models.Index(fields=['deleted_at'], name='vault_tombstone_deleted_idx'),
+        ),
+    ]
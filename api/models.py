@@ -1,7 +1,15 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import F
+from django.utils import timezone
 import uuid
 
+from .hashing_pool import run_in_hashing_pool
+
 
 class UserManager(BaseUserManager):
 
@@ -12,7 +20,7 @@ class UserManager(BaseUserManager):
         email = self.normalize_email(email)
         user = self.model(email=email, is_staff=is_staff,
                           is_superuser=is_superuser, **extra_fields)
-        user.set_password(password)
+        user.password = run_in_hashing_pool(make_password, password)
         user.save(using=self.db)
 
         return user
@@ -23,6 +31,15 @@ class UserManager(BaseUserManager):
     def create_superuser(self, email, password, **extra_fields):
         return self._create_user(email, password, True, True, **extra_fields)
 
+    # Called in the same transaction as every write to a user's VaultItems or VaultCollections,
+    # before it, and the rows written are stamped with the version returned. The UPDATE locks the
+    # user's row until the transaction ends, so the writes to a vault commit one at a time in
+    # version order: once a version is visible, every row stamped with it or a lower one is too.
+    def next_vault_version(self, user_id):
+        users = self.using(DEFAULT_DB_ALIAS).filter(pk=user_id)
+        users.update(vault_version=F('vault_version') + 1)
+        return users.values_list('vault_version', flat=True).get()
+
 
 class User(AbstractBaseUser, PermissionsMixin):
 
@@ -33,6 +50,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     last_login = models.DateTimeField(null=True, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
+    # Incremented whenever anything in the user's vault changes
+    vault_version = models.PositiveBigIntegerField(default=0)
+    # The highest vault_version of the user's tombstones pruned so far, see prune_tombstones
+    pruned_vault_version = models.PositiveBigIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -72,10 +93,46 @@ class VaultCollection(models.Model):
     name = models.CharField()
     uuid = models.UUIDField(
         primary_key=False, default=uuid.uuid4, editable=False, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+    # The user's vault_version when the collection was last written, see vault_sync
+    vault_version = models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'vault_version'], name='vault_collection_version_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_user_id = instance.__dict__.get('user_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Moving a collection to another user, which only the admin does, moves its items too
+        if getattr(self, '_loaded_user_id', self.user_id) != self.user_id:
+            self.vault_items.update(user_id=self.user_id, vault_version=self.vault_version)
+            self._loaded_user_id = self.user_id
+
+
+class VaultItemManager(models.Manager):
+
+    # bulk_create() does not call save(), so the owners are copied from the collections here
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        missing = {obj.vault_collection_id for obj in objs
+                   if obj.user_id is None and not VaultItem.vault_collection.is_cached(obj)}
+        owners = dict(VaultCollection.objects.filter(pk__in=missing).values_list('pk', 'user_id'))
+        for obj in objs:
+            if obj.user_id is None:
+                obj.user_id = owners.get(obj.vault_collection_id) or obj.vault_collection.user_id
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class VaultItem(models.Model):
     vault_collection = models.ForeignKey(
@@ -83,8 +140,86 @@ class VaultItem(models.Model):
         on_delete=models.CASCADE,
         related_name='vault_items'
     )
+    # The owner of the collection, copied here so a user's items are read off one index without
+    # joining their collections. Covered by vault_item_user_modified_idx.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        editable=False,
+    )
     encrypted_data = models.CharField()
     uuid = models.UUIDField(
         primary_key=False, default=uuid.uuid4, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
+    # The user's vault_version when the item was last written, see vault_sync
+    vault_version = models.PositiveBigIntegerField(default=0, editable=False)
+
+    objects = VaultItemManager()
+
+    class Meta:
+        indexes = [
+            # Serves a user's items already ordered for keyset pagination by (modified_at, id)
+            models.Index(fields=['user', 'modified_at', 'id'],
+                         name='vault_item_user_modified_idx'),
+            models.Index(fields=['user', 'vault_version'], name='vault_item_version_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.user_id = self.vault_collection.user_id
+        super().save(*args, **kwargs)
+
+
+# Records the uuid of a deleted VaultItem or VaultCollection so sync clients can prune their cache
+# Tombstones are kept for VAULT_TOMBSTONE_RETENTION_DAYS, see prune_tombstones
+def get_tombstone_cutoff():
+    return timezone.now() - timedelta(days=settings.VAULT_TOMBSTONE_RETENTION_DAYS)
+
+
+class VaultTombstoneManager(models.Manager):
+
+    # Leaves tombstones for a VaultItem or VaultCollection about to be deleted from, or moved out
+    # of, a user's vault. A collection's items get one each.
+    def record(self, obj, user_id, vault_version):
+        tombstones = []
+        if isinstance(obj, VaultCollection):
+            tombstones = [self.model(user_id=user_id, kind=self.model.VAULT_ITEM, uuid=uuid,
+                                     vault_version=vault_version)
+                          for uuid in obj.vault_items.values_list('uuid', flat=True)]
+            kind = self.model.VAULT_COLLECTION
+        else:
+            kind = self.model.VAULT_ITEM
+        tombstones.append(self.model(user_id=user_id, kind=kind, uuid=obj.uuid,
+                                     vault_version=vault_version))
+        return self.bulk_create(tombstones)
+
+
+class VaultTombstone(models.Model):
+    VAULT_ITEM = 'vault_item'
+    VAULT_COLLECTION = 'vault_collection'
+    KIND_CHOICES = [
+        (VAULT_ITEM, 'Vault item'),
+        (VAULT_COLLECTION, 'Vault collection'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    uuid = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    # The user's vault_version when the row was deleted, see vault_sync
+    vault_version = models.PositiveBigIntegerField(default=0, editable=False)
+
+    objects = VaultTombstoneManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'vault_version'], name='vault_tombstone_version_idx'),
+            models.Index(fields=['deleted_at'], name='vault_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.kind} {self.uuid}"
@@ -0,0 +1,105 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Opt-in keyset (seek) pagination. Requests without page_size or cursor are not paginated.
+    # Each page continues strictly after the last row of the previous one, so fetching a page
+    # costs the same however deep the client has paged. The page body keeps whatever shape the
+    # view gives it and the next page is advertised in the Link and X-Next-Cursor headers.
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params and \
+                self.page_size_query_param not in request.query_params:
+            return None
+
+        self.request = request
+        self.next_cursor = None
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = self.filter_after(queryset, position)
+
+        # Fetching one extra row tells us whether there is a next page without a COUNT
+        page = list(queryset[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+
+        return page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param],
+                                 strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    # (a, b) > (x, y) expressed as a >= x AND (a > x OR (a = x AND b > y)). The leading
+    # a >= x lets PostgreSQL seek straight to the start of the page on the composite index.
+    def filter_after(self, queryset, position):
+        first_field, first_value = self.ordering[0], position[0]
+        after = Q()
+        for index, (field, value) in enumerate(zip(self.ordering, position)):
+            equal = {previous: position[i] for i, previous in enumerate(self.ordering[:index])}
+            after |= Q(**equal, **{f'{field}__gt': value})
+        return queryset.filter(**{f'{first_field}__gte': first_value}).filter(after)
+
+    def encode_cursor(self, instance):
+        position = []
+        for field in self.ordering:
+            # Pages hold either model instances or values() rows
+            value = instance[field] if isinstance(instance, dict) else getattr(instance, field)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            return [model._meta.get_field(field).to_python(value)
+                    for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if self.next_cursor is not None:
+            headers['Link'] = f'<{self.get_next_link()}>; rel="next"'
+            headers['X-Next-Cursor'] = self.next_cursor
+        return Response(data, headers=headers)
+
+
+class VaultItemPagination(KeysetPagination):
+    ordering = ('modified_at', 'id')
+
+
+class VaultCollectionPagination(KeysetPagination):
+    ordering = ('id',)
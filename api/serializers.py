@@ -1,14 +1,46 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 
-from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
-from rest_framework.serializers import Serializer, ModelSerializer, CharField, EmailField, \
-    SlugRelatedField, StringRelatedField
+from rest_framework import ISO_8601
+from rest_framework.exceptions import AuthenticationFailed, NotFound, PermissionDenied
+from rest_framework.serializers import Serializer, ModelSerializer, CharField, ChoiceField, \
+    DateTimeField, EmailField, IntegerField, SerializerMethodField, SlugRelatedField, \
+    StringRelatedField, UUIDField, ValidationError
+from rest_framework.settings import api_settings
 
-from api.models import UserKey, VaultItem, VaultCollection
+from api.models import UserKey, VaultItem, VaultCollection, VaultTombstone
+from api.user_key_cache import get_user_key_cache
+from config.metrics import measure_serialization
 
 
-class LoginSerializer(Serializer):
+# Counts the time spent validating, saving and representing data as the request's serializer
+# time, see config.metrics. Every DRF serializer below derives from it, and the methods they
+# override are measured too, so the serializer time covers the same work for every view.
+class MeasuredSerializerMixin:
+    measured_methods = ('is_valid', 'save', 'to_representation')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.measured_methods:
+            if name in vars(cls):
+                setattr(cls, name, measure_serialization()(vars(cls)[name]))
+
+    @measure_serialization()
+    def is_valid(self, **kwargs):
+        return super().is_valid(**kwargs)
+
+    @measure_serialization()
+    def save(self, **kwargs):
+        return super().save(**kwargs)
+
+    @measure_serialization()
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class LoginSerializer(MeasuredSerializerMixin, Serializer):
     email = EmailField(required=True)
     password = CharField(required=True)
 
@@ -22,9 +54,8 @@ class LoginSerializer(Serializer):
         if user is None:
             raise AuthenticationFailed('Invalid email or password')
 
-        try:
-            user_key = UserKey.objects.get(user=user)
-        except ObjectDoesNotExist:
+        user_key = get_user_key_cache().get(user.id)
+        if user_key is None:
             raise PermissionDenied("User's symmetric key not found")
 
         data['user'] = user
@@ -34,34 +65,58 @@ class LoginSerializer(Serializer):
         return data
 
 
-class SignupSerializer(ModelSerializer):
+class SignupSerializer(MeasuredSerializerMixin, ModelSerializer):
     encrypted_symmetric_key = CharField(required=True)
 
     class Meta:
         model = get_user_model()
         fields = ['email', 'password', 'encrypted_symmetric_key']
+        # Uniqueness is enforced by the INSERT instead of a SELECT beforehand, which also
+        # catches two signups racing for the same email
+        extra_kwargs = {'email': {'validators': []}}
 
+    # The user, its default VaultCollection (see signals.py) and its UserKey are created in one
+    # transaction, so a failure part way never leaves a user without a key. The password is
+    # hashed before the first INSERT, so the transaction is not held open while hashing.
     def save(self):
-        user = get_user_model().objects.create_user(email=self.validated_data['email'],
-                                                    password=self.validated_data['password'])
-        UserKey.objects.create(
-            user=user,
-            encrypted_symmetric_key=self.validated_data['encrypted_symmetric_key']
-        )
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(
+                    email=self.validated_data['email'], password=self.validated_data['password'])
+                UserKey.objects.create(
+                    user=user,
+                    encrypted_symmetric_key=self.validated_data['encrypted_symmetric_key']
+                )
+        except IntegrityError:
+            raise ValidationError({'email': ['user with this email already exists.']})
         return user
 
 
-class UserKeySerializer(ModelSerializer):
+class UserKeySerializer(MeasuredSerializerMixin, ModelSerializer):
     class Meta:
         model = UserKey
         fields = ['encrypted_symmetric_key', 'created_at', 'modified_at']
 
 
-class VaultItemSerializer(ModelSerializer):
+class OwnedVaultCollectionField(SlugRelatedField):
+    # Looks up a VaultCollection by uuid and checks it belongs to the requesting user with the
+    # same query. An unknown uuid is a 400 like any SlugRelatedField, another user's
+    # collection is a 404.
+
+    def __init__(self, **kwargs):
+        super().__init__(slug_field='uuid', queryset=VaultCollection.objects.all(), **kwargs)
+
+    def to_internal_value(self, data):
+        vault_collection = super().to_internal_value(data)
+        if vault_collection.user_id != self.context['request'].user.id:
+            raise NotFound(detail='User does not own VaultCollection')
+        return vault_collection
+
+
+class VaultItemSerializer(MeasuredSerializerMixin, ModelSerializer):
     # This automatically looks up related VaultCollections when both serializing and deserializing
     # JSON payloads would use 'vault_collection' for the uuid field, not 'vault_collection_uuid'
-    vault_collection = SlugRelatedField(
-        slug_field='uuid', queryset=VaultCollection.objects.all())
+    vault_collection = OwnedVaultCollectionField()
     vault_collection_name = StringRelatedField(source='vault_collection')
 
     class Meta:
@@ -73,11 +128,202 @@ class VaultItemSerializer(ModelSerializer):
         read_only_fields = ['created_at', 'modified_at', 'vault_collection_name']
 
 
-class VaultCollectionSerializer(ModelSerializer):
+class VaultItemReadSerializer:
+    # Read-only fast path with the same output as VaultItemSerializer, used to list and retrieve
+    # vault items. It reads rows from queryset.values(*VaultItemReadSerializer.values) instead of
+    # model instances and builds the dicts directly, skipping the model instance and the per-field
+    # serializer objects for every item. Writes are still validated by VaultItemSerializer.
+    # id is only fetched for the pagination cursor. Callers measure its serializer time around
+    # the whole batch, rather than paying for it on every row.
+    values = ('id', 'encrypted_data', 'uuid', 'vault_collection__uuid', 'vault_collection__name',
+              'created_at', 'modified_at')
+
+    def __init__(self):
+        # The DateTimeField VaultItemSerializer builds for created_at and modified_at
+        self.datetime_field = DateTimeField()
+        # The database returns aware datetimes with USE_TZ. For those, and DRF's default ISO 8601
+        # output, format_datetime does the same conversion as the field without its per call
+        # settings lookups and checks, which cost several times as much as the formatting itself.
+        self.timezone = timezone.get_current_timezone()
+        self.iso_8601 = settings.USE_TZ and api_settings.DATETIME_FORMAT == ISO_8601
+
+    def format_datetime(self, value):
+        if value is None or not self.iso_8601:
+            return self.datetime_field.to_representation(value)
+
+        representation = value.astimezone(self.timezone).isoformat()
+        if representation.endswith('+00:00'):
+            representation = representation[:-6] + 'Z'
+        return representation
+
+    def to_representation(self, row):
+        return {
+            'encrypted_data': row['encrypted_data'],
+            'uuid': str(row['uuid']),
+            # Left as a UUID like SlugRelatedField does, the renderer turns it into a string
+            'vault_collection': row['vault_collection__uuid'],
+            # VaultCollection.__str__, which StringRelatedField calls, returns the name
+            'vault_collection_name': row['vault_collection__name'],
+            'created_at': self.format_datetime(row['created_at']),
+            'modified_at': self.format_datetime(row['modified_at']),
+        }
+
+
+class VaultItemBulkOperationSerializer(MeasuredSerializerMixin, Serializer):
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    op = ChoiceField(choices=[CREATE, UPDATE, DELETE])
+    uuid = UUIDField(required=False)
+    encrypted_data = CharField(required=False)
+    vault_collection = UUIDField(required=False)
+
+    def validate(self, data):
+        if data['op'] == self.CREATE:
+            required_fields = ['encrypted_data', 'vault_collection']
+        else:
+            required_fields = ['uuid']
+
+        errors = {field: ['This field is required.']
+                  for field in required_fields if field not in data}
+        if data['op'] == self.CREATE and 'uuid' in data:
+            errors['uuid'] = ['VaultItem uuids are assigned by the server.']
+        if errors:
+            raise ValidationError(errors)
+
+        return data
+
+
+class VaultItemBulkSerializer(MeasuredSerializerMixin, Serializer):
+    MAX_OPERATIONS = 1000
+
+    operations = VaultItemBulkOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, operations):
+        if len(operations) > self.MAX_OPERATIONS:
+            raise ValidationError(
+                f'Ensure this field has no more than {self.MAX_OPERATIONS} operations.')
+        return operations
+
+    # Resolves every referenced VaultCollection and VaultItem with one query each, scoped to
+    # the requesting user, and reports problems per operation
+    def validate(self, data):
+        user_id = self.context['request'].user.id
+        operations = data['operations']
+
+        collection_uuids = {operation['vault_collection'] for operation in operations
+                            if 'vault_collection' in operation}
+        item_uuids = {operation['uuid'] for operation in operations if 'uuid' in operation}
+
+        vault_collections = {vault_collection.uuid: vault_collection
+                             for vault_collection in VaultCollection.objects.filter(
+                                 user_id=user_id, uuid__in=collection_uuids)}
+        vault_items = {vault_item.uuid: vault_item
+                       for vault_item in VaultItem.objects.select_related('vault_collection').filter(
+                           user_id=user_id, uuid__in=item_uuids)}
+
+        errors = []
+        seen_item_uuids = set()
+        for operation in operations:
+            operation_errors = {}
+            if 'vault_collection' in operation:
+                if operation['vault_collection'] in vault_collections:
+                    operation['vault_collection'] = vault_collections[operation['vault_collection']]
+                else:
+                    operation_errors['vault_collection'] = ['User does not own VaultCollection']
+            if 'uuid' in operation:
+                if operation['uuid'] not in vault_items:
+                    operation_errors['uuid'] = ['Not found.']
+                elif operation['uuid'] in seen_item_uuids:
+                    operation_errors['uuid'] = ['Only one operation per VaultItem is allowed.']
+                else:
+                    operation['vault_item'] = vault_items[operation['uuid']]
+                seen_item_uuids.add(operation['uuid'])
+            errors.append(operation_errors)
+
+        if any(errors):
+            raise ValidationError({'operations': errors})
+
+        return data
+
+    # Applies every operation in one transaction using bulk statements and returns
+    # one result per operation, in request order
+    def save(self):
+        user_id = self.context['request'].user.id
+        created, updated, deleted = [], [], []
+        results = []
+
+        for operation in self.validated_data['operations']:
+            if operation['op'] == VaultItemBulkOperationSerializer.CREATE:
+                vault_item = VaultItem(encrypted_data=operation['encrypted_data'],
+                                       vault_collection=operation['vault_collection'])
+                created.append(vault_item)
+            elif operation['op'] == VaultItemBulkOperationSerializer.UPDATE:
+                vault_item = operation['vault_item']
+                if 'encrypted_data' in operation:
+                    vault_item.encrypted_data = operation['encrypted_data']
+                if 'vault_collection' in operation:
+                    vault_item.vault_collection = operation['vault_collection']
+                updated.append(vault_item)
+            else:
+                vault_item = operation['vault_item']
+                deleted.append(vault_item)
+            results.append((operation['op'], vault_item))
+
+        with transaction.atomic():
+            vault_version = get_user_model().objects.next_vault_version(user_id)
+            # bulk_update() bypasses auto_now
+            now = timezone.now()
+            for vault_item in created + updated:
+                vault_item.vault_version = vault_version
+                vault_item.modified_at = now
+            if created:
+                VaultItem.objects.bulk_create(created)
+            if updated:
+                VaultItem.objects.bulk_update(
+                    updated, ['encrypted_data', 'vault_collection', 'modified_at', 'vault_version'])
+            if deleted:
+                VaultTombstone.objects.bulk_create([
+                    VaultTombstone(user_id=user_id, kind=VaultTombstone.VAULT_ITEM,
+                                   uuid=vault_item.uuid, vault_version=vault_version)
+                    for vault_item in deleted
+                ])
+                VaultItem.objects.filter(id__in=[vault_item.id for vault_item in deleted]).delete()
+
+        payload = []
+        for op, vault_item in results:
+            result = {'op': op, 'uuid': str(vault_item.uuid)}
+            if op != VaultItemBulkOperationSerializer.DELETE:
+                result['vault_item'] = VaultItemSerializer(vault_item).data
+            payload.append(result)
+
+        return payload
+
+
+class VaultCollectionSerializer(MeasuredSerializerMixin, ModelSerializer):
+    # Only returned when asked for with ?include=items or ?include=item_count, see
+    # VaultCollectionViewSet.get_include(). Items use the same {uuid: item} shape as the list.
+    vault_items = SerializerMethodField()
+    item_count = IntegerField(read_only=True)
+
     class Meta:
         model = VaultCollection
-        fields = ['name', 'uuid']
+        fields = ['name', 'uuid', 'vault_items', 'item_count']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        include = self.context.get('include', ())
+        if 'items' not in include:
+            del fields['vault_items']
+        if 'item_count' not in include:
+            del fields['item_count']
+        return fields
+
+    def get_vault_items(self, vault_collection):
+        serializer = VaultItemSerializer(vault_collection.vault_items.all(), many=True)
+        return {item['uuid']: item for item in serializer.data}
 
     def save(self, **kwargs):
         self.validated_data['user_id'] = self.context['request'].user.id
-        return super().save()
+        return super().save(**kwargs)
@@ -1,10 +1,23 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import User, VaultCollection
+from .models import User, UserKey, VaultCollection
+from .user_key_cache import get_user_key_cache
 
 
+# The vault_version is not bumped: the collection is created together with the user, so
+# no client can have seen the vault without it
 @receiver(post_save, sender=User)
 def create_default_vault_collection(sender, instance, created, **kwargs):
     if created:
         VaultCollection.objects.create(user=instance, name="Default")
+
+
+# Invalidated straight away and again once the transaction commits, so a concurrent request
+# that cached the old row before the commit does not keep it
+@receiver([post_save, post_delete], sender=UserKey)
+def invalidate_user_key_cache(sender, instance, **kwargs):
+    user_key_cache = get_user_key_cache()
+    user_key_cache.invalidate(instance.user_id)
+    transaction.on_commit(lambda: user_key_cache.invalidate(instance.user_id))
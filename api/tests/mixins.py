@@ -0,0 +1,39 @@
+from django.conf import settings
+
+from config.query_inspection import capture_queries
+
+
+class QueryCountAssertionsMixin:
+
+    # Makes the request, reading the whole body of a streamed response, and returns its queries
+    def capture_request(self, make_request):
+        with capture_queries() as log:
+            response = make_request()
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        return log
+
+    # Fails when the number of queries make_request() runs grows as add_data() adds rows,
+    # naming the query shapes that were run more often. The first request is not counted, so
+    # that caches filled by it do not hide an extra query.
+    def assertQueryCountConstant(self, make_request, add_data, rounds=2):
+        self.capture_request(make_request)
+        baseline = self.capture_request(make_request)
+        for _ in range(rounds):
+            add_data()
+            log = self.capture_request(make_request)
+            if len(log) > len(baseline):
+                grown = log.shapes()
+                grown.subtract(baseline.shapes())
+                self.fail(f'{len(baseline)} queries grew to {len(log)} with more data:\n' +
+                          '\n'.join(f'{count} more of: {shape}'
+                                    for shape, count in grown.most_common() if count > 0))
+
+    # Fails when make_request() runs a query shape QUERY_INSPECTION_REPEAT_THRESHOLD times or more
+    def assertNoRepeatedQueries(self, make_request, threshold=None):
+        log = self.capture_request(make_request)
+        repeated = log.repeated(threshold or settings.QUERY_INSPECTION_REPEAT_THRESHOLD)
+        if repeated:
+            self.fail('Repeated queries:\n' + '\n'.join(
+                f'{count} times: {shape}' for shape, count in repeated.items()))
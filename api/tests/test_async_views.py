@@ -0,0 +1,133 @@
+import gzip
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import include, path
+
+from api.models import UserKey, VaultCollection, VaultItem
+from api.urls import async_read_urlpatterns
+from api.views import VaultItemViewSet
+
+# The async views under /async/ next to the regular DRF routes, so both can be compared
+urlpatterns = [
+    path('async/', include(async_read_urlpatterns)),
+    path('', include('api.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF='api.tests.test_async_views')
+class TestAsyncReadViews(TestCase):
+
+    def setUp(self):
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.user_key = UserKey.objects.create(
+            user=self.user,
+            encrypted_symmetric_key='somelonggobbledegookthatlookslikeitsabase64encodedstring'
+        )
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.vault_item1 = VaultItem.objects.create(
+            encrypted_data='encrypted data 1', vault_collection_id=self.vault_collection.id)
+        self.vault_item2 = VaultItem.objects.create(
+            encrypted_data='encrypted data 2', vault_collection_id=self.vault_collection.id)
+
+        self.other_user = get_user_model().objects.create_user(
+            email='pippa2@gmail.com', password='super-password')
+        other_user_vc = VaultCollection.objects.create(
+            name='folder2', user_id=self.other_user.id)
+        self.other_user_vi = VaultItem.objects.create(
+            encrypted_data='encrypted data other user', vault_collection_id=other_user_vc.id)
+
+        # Logging in touches the database synchronously, so it cannot happen inside the tests
+        self.client.login(**self.user_data)
+        self.async_client.login(**self.user_data)
+
+    async def assertSameAsDRF(self, path):
+        expected = await sync_to_async(self.client.get)(path)
+        response = await self.async_client.get(f'/async{path}')
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        return response
+
+    async def test_user_key(self):
+        await self.assertSameAsDRF('/user_key/')
+
+    async def test_vault_items_list(self):
+        response = await self.assertSameAsDRF('/vault_items/')
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    async def test_vault_items_detail(self):
+        await self.assertSameAsDRF(f'/vault_items/{self.vault_item1.uuid}/')
+
+    async def test_vault_items_detail_belongs_to_other_user(self):
+        response = await self.assertSameAsDRF(f'/vault_items/{self.other_user_vi.uuid}/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vault_items_detail_invalid_uuid(self):
+        response = await self.assertSameAsDRF('/vault_items/not-a-uuid/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vault_collections_list(self):
+        await self.assertSameAsDRF('/vault_collections/')
+
+    async def test_vault_items_list_not_modified(self):
+        response = await self.async_client.get('/async/vault_items/')
+        response = await self.async_client.get('/async/vault_items/',
+                                               headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_user_not_authenticated(self):
+        for url in ['/async/user_key/', '/async/vault_items/', '/async/vault_collections/',
+                    f'/async/vault_items/{self.vault_item1.uuid}/']:
+            response = await AsyncClient().get(url)
+            self.assertEqual(response.status_code, 403)
+            self.assertIn('Authentication credentials were not provided.',
+                          json.loads(response.content)['detail'])
+
+    async def test_paginated_list_served_by_drf_view(self):
+        response = await self.async_client.get('/async/vault_items/', {'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 1)
+        self.assertIn('X-Next-Cursor', response.headers)
+
+    async def test_write_served_by_drf_view(self):
+        response = await self.async_client.post('/async/vault_items/', {
+            'encrypted_data': 'new encrypted data',
+            'vault_collection': str(self.vault_collection.uuid)
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await VaultItem.objects.filter(
+            encrypted_data='new encrypted data').aexists())
+
+    # Streamed as an async iterator, which Django sends as it goes rather than reading it whole
+    @mock.patch.object(VaultItemViewSet, 'export_chunk_size', 1)
+    async def test_vault_items_export_streams(self):
+        response = await self.async_client.get('/vault_items/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        listed = await sync_to_async(self.client.get)('/vault_items/')
+        self.assertEqual(json.loads(b''.join(chunks)), json.loads(listed.content))
+
+    async def test_vault_items_export_compressed(self):
+        response = await self.async_client.get('/vault_items/export/',
+                                               headers={'Accept-Encoding': 'gzip'})
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        exported = json.loads(gzip.decompress(
+            b''.join([chunk async for chunk in response.streaming_content])))
+        self.assertEqual(len(exported), 2)
+
+    async def test_health_check(self):
+        response = await self.async_client.get('/health')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'OK')
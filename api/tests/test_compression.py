@@ -0,0 +1,148 @@
+import gzip
+import json
+from unittest import skipIf
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem
+from config.compression_middleware import CompressionMiddleware, brotli, choose_encoding, \
+    get_compression_stats, reset_compression_stats, zstandard
+
+JSON_BODY = json.dumps({'encrypted_data': 'U2FsdGVkX1+' * 200}).encode()
+
+
+@override_settings(COMPRESSION_ENCODINGS=['zstd', 'br', 'gzip'], COMPRESSION_MIN_SIZE=1024,
+                   COMPRESSION_LEVELS={'gzip': 6, 'br': 4, 'zstd': 3})
+class TestCompressionMiddleware(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        reset_compression_stats()
+
+    def request(self, response, accept_encoding='gzip'):
+        request = self.factory.get('/vault_items/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip(self):
+        response = self.request(HttpResponse(JSON_BODY, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(gzip.decompress(response.content), JSON_BODY)
+
+    def test_stats(self):
+        response = self.request(HttpResponse(JSON_BODY, content_type='application/json'))
+        stats = get_compression_stats()['gzip']
+        self.assertEqual(stats['responses'], 1)
+        self.assertEqual(stats['raw_bytes'], len(JSON_BODY))
+        self.assertEqual(stats['compressed_bytes'], len(response.content))
+        self.assertLess(stats['ratio'], 0.1)
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        response = self.request(HttpResponse(JSON_BODY, content_type='application/json'),
+                                'gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), JSON_BODY)
+
+    @skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstd(self):
+        response = self.request(HttpResponse(JSON_BODY, content_type='application/json'),
+                                'gzip, br, zstd')
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        self.assertEqual(zstandard.ZstdDecompressor().decompressobj().decompress(response.content),
+                         JSON_BODY)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(choose_encoding('br;q=0, gzip'), 'gzip')
+        self.assertEqual(choose_encoding('identity'), None)
+        self.assertEqual(choose_encoding(''), None)
+        with override_settings(COMPRESSION_ENCODINGS=['gzip']):
+            self.assertEqual(choose_encoding('*'), 'gzip')
+        with override_settings(COMPRESSION_ENCODINGS=[]):
+            self.assertEqual(choose_encoding('gzip'), None)
+
+    def test_small_response_not_compressed(self):
+        response = self.request(HttpResponse(b'{"a": 1}', content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_other_content_type_not_compressed(self):
+        response = self.request(HttpResponse(JSON_BODY, content_type='text/html'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_not_accepted(self):
+        response = self.request(HttpResponse(JSON_BODY, content_type='application/json'),
+                                'identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, JSON_BODY)
+
+    def test_etag_weakened(self):
+        response = HttpResponse(JSON_BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.request(response)['ETag'], 'W/"abc"')
+
+    def test_streaming(self):
+        chunks = [b'{'] + [b'"%d":"%s",' % (i, b'x' * 50) for i in range(100)] + [b'"end":1}']
+        response = self.request(StreamingHttpResponse(chunks, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+        self.assertEqual(get_compression_stats()['gzip']['raw_bytes'], len(b''.join(chunks)))
+
+    def test_async_streaming(self):
+        async def chunks():
+            for chunk in [b'{"a":', b'"' + b'x' * 2000 + b'"}']:
+                yield chunk
+
+        async def get_response(request):
+            return StreamingHttpResponse(chunks(), content_type='application/json')
+
+        async def request():
+            response = await CompressionMiddleware(get_response)(
+                self.factory.get('/vault_items/', HTTP_ACCEPT_ENCODING='gzip'))
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        response, content = async_to_sync(request)()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(content), b'{"a":"' + b'x' * 2000 + b'"}')
+
+
+@override_settings(COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=1024)
+class TestCompressedVaultItems(APITestCase):
+
+    def setUp(self):
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        vault_collection = VaultCollection.objects.create(name='folder1', user_id=self.user.id)
+        VaultItem.objects.bulk_create([
+            VaultItem(encrypted_data=f'encrypted data {i}', vault_collection=vault_collection)
+            for i in range(20)
+        ])
+        self.client.login(**self.user_data)
+
+    def test_vault_items_list(self):
+        response = self.client.get(reverse('vault_item-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 20)
+
+        # The weakened ETag still revalidates
+        response = self.client.get(reverse('vault_item-list'), HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_vault_items_export(self):
+        response = self.client.get(reverse('vault_item-export'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        exported = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(len(exported), 20)
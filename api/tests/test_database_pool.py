@@ -0,0 +1,62 @@
+from copy import deepcopy
+from threading import Thread
+from time import sleep
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase
+
+from config.postgresql_pool.base import DatabaseWrapper, _pools, get_pool_stats
+
+
+class TestPooledDatabaseWrapper(SimpleTestCase):
+    alias = 'pool_test'
+
+    def setUp(self):
+        self.settings_dict = deepcopy(connection.settings_dict)
+        self.settings_dict['CONN_MAX_AGE'] = 0
+        self.settings_dict['OPTIONS'] = {'pool': {'min_size': 1, 'max_size': 1, 'timeout': 5}}
+
+    def tearDown(self):
+        DatabaseWrapper(self.settings_dict, self.alias).close_pool()
+
+    def connect(self):
+        wrapper = DatabaseWrapper(self.settings_dict, self.alias)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return wrapper
+
+    def test_connection_reused(self):
+        for _ in range(3):
+            wrapper = self.connect()
+            wrapper.close()
+        stats = get_pool_stats(self.alias)
+        self.assertEqual(stats['requests_num'], 3)
+        self.assertEqual(stats['connections_num'], 1)
+        self.assertEqual(stats['pool_available'], 1)
+
+    def test_wait_time_recorded(self):
+        wrapper = self.connect()
+        waiting = Thread(target=lambda: self.connect().close())
+        waiting.start()
+        sleep(0.2)
+        wrapper.close()
+        waiting.join()
+
+        stats = get_pool_stats(self.alias)
+        self.assertGreaterEqual(stats['requests_queued'], 1)
+        self.assertGreaterEqual(stats['requests_wait_ms'], 100)
+        self.assertGreater(stats['requests_wait_ms_avg'], 0)
+
+    def test_health_checks(self):
+        self.settings_dict['CONN_HEALTH_CHECKS'] = True
+        self.connect().close()
+        self.assertEqual(_pools[self.alias]._check, _pools[self.alias].check_connection)
+
+    def test_persistent_connections_rejected(self):
+        self.settings_dict['CONN_MAX_AGE'] = 60
+        with self.assertRaises(ImproperlyConfigured):
+            self.connect()
+
+    def test_no_pool_stats_before_first_connection(self):
+        self.assertIsNone(get_pool_stats(self.alias))
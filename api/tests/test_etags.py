@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem
+
+
+class TestVaultListETags(APITestCase):
+
+    def setUp(self):
+        self.vault_items_url = reverse('vault_item-list')
+        self.vault_collections_url = reverse('vault_collection-list')
+
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.vault_item1 = VaultItem.objects.create(
+            encrypted_data='encrypted data 1', vault_collection_id=self.vault_collection.id)
+        self.vault_item2 = VaultItem.objects.create(
+            encrypted_data='encrypted data 2', vault_collection_id=self.vault_collection.id)
+
+        self.other_user_data = {
+            'email': 'pippa2@gmail.com',
+            'password': 'super-password'
+        }
+        self.other_user = get_user_model().objects.create_user(**self.other_user_data)
+        self.other_user_vc = VaultCollection.objects.create(
+            name='folder2', user_id=self.other_user.id)
+
+        self.client.login(**self.user_data)
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag.removeprefix('W/'))
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_vault_items_etag_not_modified(self):
+        response = self.client.get(self.vault_items_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        # session and user only; the ETag comes from the user's vault_version
+        with self.assertNumQueries(2):
+            self.assertNotModified(self.vault_items_url, etag)
+        self.assertNotModified(self.vault_items_url, f'W/{etag}')
+
+    def test_vault_items_etag_changes_on_update(self):
+        etag = self.client.get(self.vault_items_url)['ETag']
+        self.client.patch(reverse('vault_item-detail', kwargs={'uuid': self.vault_item1.uuid}),
+                          {'encrypted_data': 'updated encrypted data'})
+        self.assertModified(self.vault_items_url, etag)
+
+    def test_vault_items_etag_changes_on_create(self):
+        etag = self.client.get(self.vault_items_url)['ETag']
+        self.client.post(self.vault_items_url, {
+            'encrypted_data': 'encrypted data 3',
+            'vault_collection': self.vault_collection.uuid
+        })
+        self.assertModified(self.vault_items_url, etag)
+
+    def test_vault_items_etag_changes_on_delete(self):
+        etag = self.client.get(self.vault_items_url)['ETag']
+        self.client.delete(reverse('vault_item-detail', kwargs={'uuid': self.vault_item1.uuid}))
+        self.assertModified(self.vault_items_url, etag)
+
+    def test_vault_items_etag_changes_on_collection_rename(self):
+        etag = self.client.get(self.vault_items_url)['ETag']
+        self.client.put(reverse('vault_collection-detail',
+                                kwargs={'uuid': self.vault_collection.uuid}),
+                        {'name': 'renamed folder'})
+        self.assertModified(self.vault_items_url, etag)
+
+    def test_vault_items_etag_ignores_other_users(self):
+        etag = self.client.get(self.vault_items_url)['ETag']
+        VaultItem.objects.create(
+            encrypted_data='encrypted data other user', vault_collection_id=self.other_user_vc.id)
+        self.assertNotModified(self.vault_items_url, etag)
+
+    def test_vault_items_etag_differs_per_page(self):
+        first_page = self.client.get(self.vault_items_url, {'page_size': 1})
+        second_page = self.client.get(self.vault_items_url, {
+            'page_size': 1, 'cursor': first_page['X-Next-Cursor']})
+        self.assertNotEqual(first_page['ETag'], second_page['ETag'])
+        self.assertNotEqual(first_page['ETag'], self.client.get(self.vault_items_url)['ETag'])
+
+    def test_vault_collections_etag(self):
+        response = self.client.get(self.vault_collections_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertNotEqual(etag, self.client.get(self.vault_items_url)['ETag'])
+        self.assertNotModified(self.vault_collections_url, etag)
+
+        self.client.post(self.vault_collections_url, {'name': 'Work'})
+        self.assertModified(self.vault_collections_url, etag)
@@ -0,0 +1,87 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.hashing_pool import HashingPool, HashingPoolSaturated, run_in_hashing_pool
+from api.models import UserKey
+
+
+class TestHashingPool(APITestCase):
+
+    def test_run_returns_result(self):
+        pool = HashingPool(workers=1, queue_depth=0, timeout=5)
+        self.assertEqual(pool.run(sum, [1, 2, 3]), 6)
+        # The slot is handed back once the call completes
+        self.assertEqual(pool.run(sum, [4]), 4)
+        pool.shutdown()
+
+    def test_run_sheds_when_saturated(self):
+        pool = HashingPool(workers=1, queue_depth=0, timeout=5)
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        busy = threading.Thread(target=pool.run, args=(block,))
+        busy.start()
+        started.wait(5)
+        with self.assertRaises(HashingPoolSaturated):
+            pool.run(sum, [1])
+        release.set()
+        busy.join(5)
+        self.assertEqual(pool.run(sum, [1]), 1)
+        pool.shutdown()
+
+    def test_run_times_out(self):
+        pool = HashingPool(workers=1, queue_depth=0, timeout=0.01)
+        release = threading.Event()
+        with self.assertRaises(HashingPoolSaturated):
+            pool.run(release.wait, 5)
+        release.set()
+        pool.shutdown()
+
+
+@override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE_DEPTH=0)
+class TestLoginHashingPool(APITestCase):
+
+    def setUp(self):
+        self.login_url = reverse('login')
+        self.user_data = {
+            'email': 'marion@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        UserKey.objects.create(user=self.user, encrypted_symmetric_key='somelonggobbledegook')
+
+    def test_login_success(self):
+        response = self.client.post(self.login_url, self.user_data)
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_rejected_when_pool_saturated(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        busy = threading.Thread(target=run_in_hashing_pool, args=(block,))
+        busy.start()
+        started.wait(5)
+        try:
+            response = self.client.post(self.login_url, self.user_data)
+        finally:
+            release.set()
+            busy.join(5)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Too many logins are being processed', response.data['detail'])
+        self.assertNotIn('sessionid', response.cookies)
+
+        response = self.client.post(self.login_url, self.user_data)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,169 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import UserKey, VaultCollection, VaultItem
+from config.metrics import Histogram, reset_metrics
+from config.metrics_middleware import MetricsMiddleware
+from config.query_recorder import install_query_recorder
+
+
+# The samples of a text exposition, by name and labels
+def parse_metrics(content):
+    return {line.rpartition(' ')[0]: float(line.rpartition(' ')[2])
+            for line in content.decode().splitlines() if line and not line.startswith('#')}
+
+
+class TestHistogram(SimpleTestCase):
+
+    def test_expose(self):
+        histogram = Histogram('test_seconds', 'Test.', ('view',), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('vault_item-list',), value)
+        self.assertEqual(histogram.expose(), [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="vault_item-list",le="0.1"} 2',
+            'test_seconds_bucket{view="vault_item-list",le="1"} 3',
+            'test_seconds_bucket{view="vault_item-list",le="+Inf"} 4',
+            'test_seconds_sum{view="vault_item-list"} 3.65',
+            'test_seconds_count{view="vault_item-list"} 4',
+        ])
+
+    def test_label_escaping(self):
+        histogram = Histogram('test_seconds', 'Test.', ('view',), ())
+        histogram.observe(('a"b\\c\n',), 1)
+        self.assertIn(r'test_seconds_count{view="a\"b\\c\n"} 1', histogram.expose())
+
+
+class TestMetricsDisabled(SimpleTestCase):
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            MetricsMiddleware(lambda request: HttpResponse())
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_no_endpoint(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_SAMPLE_RATE=1, METRICS_PATH='/metrics',
+                   METRICS_TOKEN='scrape-token')
+class TestMetrics(APITestCase):
+
+    def setUp(self):
+        reset_metrics()
+        # The test database connection predates the middleware, which may first have been
+        # loaded by the async client on another thread
+        install_query_recorder(connection)
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        vault_collection = VaultCollection.objects.create(name='Dossiers', user_id=self.user.id)
+        for i in range(3):
+            VaultItem.objects.create(encrypted_data=f'encrypted data {i}',
+                                     vault_collection_id=vault_collection.id)
+        self.client.login(**self.user_data)
+
+    def scrape(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return parse_metrics(response.content)
+
+    def test_view_recorded(self):
+        response = self.client.get(reverse('vault_item-list'))
+        with self.assertNumQueries(0):
+            samples = self.scrape()
+
+        labels = '{view="vault_item-list",method="GET"}'
+        self.assertEqual(samples['keyfortress_requests_total'
+                                 '{view="vault_item-list",method="GET",status="200"}'], 1)
+        self.assertEqual(samples[f'keyfortress_request_duration_seconds_count{labels}'], 1)
+        self.assertGreater(samples[f'keyfortress_request_duration_seconds_sum{labels}'], 0)
+        # The session, the user and the vault items
+        self.assertEqual(samples[f'keyfortress_request_db_queries_sum{labels}'], 3)
+        self.assertGreater(samples[f'keyfortress_request_db_duration_seconds_sum{labels}'], 0)
+        self.assertGreater(samples[f'keyfortress_request_serializer_duration_seconds_sum{labels}'],
+                           0)
+        self.assertEqual(samples[f'keyfortress_response_size_bytes_sum{labels}'],
+                         len(response.content))
+        self.assertIn('keyfortress_user_key_cache_lookups_total{result="misses"}', samples)
+
+    def test_drf_serializers_measured(self):
+        UserKey.objects.create(user=self.user, encrypted_symmetric_key='somelonggobbledegook')
+        self.client.get(reverse('vault_collection-list'))
+        self.client.get(reverse('user_key'))
+        samples = self.scrape()
+        for view in ('vault_collection-list', 'user_key'):
+            self.assertGreater(samples['keyfortress_request_serializer_duration_seconds_sum'
+                                       f'{{view="{view}",method="GET"}}'], 0)
+
+    def test_drf_serializers_measured_on_writes(self):
+        UserKey.objects.create(user=self.user, encrypted_symmetric_key='somelonggobbledegook')
+        vault_collection = VaultCollection.objects.get(user=self.user, name='Dossiers')
+        self.client.post(reverse('vault_item-list'), {
+            'encrypted_data': 'new encrypted data', 'vault_collection': vault_collection.uuid})
+        self.client.post(reverse('vault_item-bulk'), {'operations': [
+            {'op': 'create', 'encrypted_data': 'bulk encrypted data',
+             'vault_collection': str(vault_collection.uuid)}]}, format='json')
+        self.client.patch(reverse('vault_collection-detail', args=[vault_collection.uuid]),
+                          {'name': 'Folders'})
+        self.client.get(reverse('vault_collection-list'), {'include': 'items'})
+        self.client.post(reverse('login'), self.user_data)
+        self.client.post(reverse('signup'), {'email': 'pippa2@gmail.com',
+                                             'password': 'super-password',
+                                             'encrypted_symmetric_key': 'somelonggobbledegook'})
+        samples = self.scrape()
+        for view, method in [('vault_item-list', 'POST'), ('vault_item-bulk', 'POST'),
+                             ('vault_collection-detail', 'PATCH'), ('vault_collection-list', 'GET'),
+                             ('login', 'POST'), ('signup', 'POST')]:
+            self.assertGreater(samples['keyfortress_request_serializer_duration_seconds_sum'
+                                       f'{{view="{view}",method="{method}"}}'], 0, view)
+
+    def test_unmatched(self):
+        self.client.get('/nowhere/')
+        samples = self.scrape()
+        self.assertEqual(samples['keyfortress_requests_total'
+                                 '{view="unmatched",method="GET",status="404"}'], 1)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_only_counted(self):
+        self.client.get(reverse('vault_item-list'))
+        samples = self.scrape()
+        self.assertEqual(samples['keyfortress_requests_total'
+                                 '{view="vault_item-list",method="GET",status="200"}'], 1)
+        self.assertNotIn('keyfortress_request_duration_seconds_count'
+                         '{view="vault_item-list",method="GET"}', samples)
+
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong')
+                         .status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+                         .status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_no_token_refused(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    async def test_async(self):
+        await sync_to_async(self.async_client.login)(**self.user_data)
+        await self.async_client.get(reverse('vault_item-list'))
+        response = await self.async_client.get(
+            '/metrics', headers={'Authorization': 'Bearer scrape-token'})
+        samples = parse_metrics(response.content)
+        self.assertEqual(samples['keyfortress_request_duration_seconds_count'
+                                 '{view="vault_item-list",method="GET"}'], 1)
+        self.assertEqual(samples['keyfortress_request_db_queries_sum'
+                                 '{view="vault_item-list",method="GET"}'], 3)
@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem
+
+
+class TestVaultItemPagination(APITestCase):
+
+    def setUp(self):
+        self.vault_items_url = reverse('vault_item-list')
+
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.vault_items = [
+            VaultItem.objects.create(encrypted_data=f'encrypted data {i}',
+                                     vault_collection_id=self.vault_collection.id)
+            for i in range(7)
+        ]
+
+        self.other_user = get_user_model().objects.create_user(
+            email='pippa2@gmail.com', password='super-password')
+        other_user_vc = VaultCollection.objects.create(
+            name='folder2', user_id=self.other_user.id)
+        VaultItem.objects.create(encrypted_data='encrypted data other user',
+                                 vault_collection_id=other_user_vc.id)
+
+    def test_vault_items_paginated(self):
+        self.client.login(**self.user_data)
+        seen = []
+        params = {'page_size': 3}
+        pages = 0
+        while True:
+            response = self.client.get(self.vault_items_url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data), 3)
+            for uuid, item in response.data.items():
+                self.assertEqual(uuid, item['uuid'])
+            seen.extend(response.data)
+            pages += 1
+            if 'X-Next-Cursor' not in response.headers:
+                break
+            self.assertIn('rel="next"', response.headers['Link'])
+            params['cursor'] = response.headers['X-Next-Cursor']
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [str(vault_item.uuid) for vault_item in self.vault_items])
+
+    def test_vault_items_paginated_follows_modified_at(self):
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_items_url, {'page_size': 2})
+        cursor = response.headers['X-Next-Cursor']
+
+        # Touching an already seen item moves it behind the cursor so it is served again
+        self.vault_items[0].encrypted_data = 'updated encrypted data'
+        self.vault_items[0].save()
+        seen = []
+        params = {'page_size': 2, 'cursor': cursor}
+        while True:
+            response = self.client.get(self.vault_items_url, params)
+            seen.extend(response.data)
+            if 'X-Next-Cursor' not in response.headers:
+                break
+            params['cursor'] = response.headers['X-Next-Cursor']
+        self.assertEqual(seen[-1], str(self.vault_items[0].uuid))
+        self.assertEqual(len(seen), 6)
+
+    def test_vault_items_page_query_count_constant(self):
+        self.client.login(**self.user_data)
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get(self.vault_items_url, {'page_size': 2})
+        cursor = response.headers['X-Next-Cursor']
+        with CaptureQueriesContext(connection) as next_page:
+            self.client.get(self.vault_items_url, {'page_size': 2, 'cursor': cursor})
+        self.assertEqual(len(first_page), len(next_page))
+
+    def test_vault_items_not_paginated_by_default(self):
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_items_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 7)
+        self.assertNotIn('Link', response.headers)
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+    def test_vault_items_invalid_cursor(self):
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_items_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('Invalid cursor', response.data['detail'])
+
+
+class TestVaultCollectionPagination(APITestCase):
+
+    def setUp(self):
+        self.vault_collections_url = reverse('vault_collection-list')
+
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        for i in range(4):
+            VaultCollection.objects.create(name=f'folder{i}', user_id=self.user.id)
+
+    def test_vault_collections_paginated(self):
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_collections_url, {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([collection['name'] for collection in response.data],
+                         ['Default', 'folder0', 'folder1'])
+
+        response = self.client.get(self.vault_collections_url, {
+            'page_size': 3, 'cursor': response.headers['X-Next-Cursor']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([collection['name'] for collection in response.data],
+                         ['folder2', 'folder3'])
+        self.assertNotIn('X-Next-Cursor', response.headers)
@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import UserKey
+
+PASSWORD_HASHERS = [
+    'api.hashers.TunableArgon2PasswordHasher',
+    'api.hashers.TunablePBKDF2PasswordHasher',
+]
+
+
+@override_settings(PASSWORD_HASHERS=PASSWORD_HASHERS, ARGON2_TIME_COST=1,
+                   ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1, PBKDF2_ITERATIONS=1000)
+class TestPasswordHashing(APITestCase):
+
+    def setUp(self):
+        self.login_url = reverse('login')
+        self.user_data = {
+            'email': 'marion@gmail.com',
+            'password': 'super-password'
+        }
+
+    def create_user(self, password_hash):
+        user = get_user_model().objects.create(email=self.user_data['email'], password=password_hash)
+        UserKey.objects.create(user=user, encrypted_symmetric_key='somelonggobbledegook')
+        return user
+
+    def test_new_password_hashed_with_argon2id(self):
+        user = get_user_model().objects.create_user(**self.user_data)
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+        self.assertIn('m=1024,t=1,p=1', user.password)
+
+    def test_pbkdf2_password_rehashed_on_login(self):
+        user = self.create_user(make_password(self.user_data['password'], hasher='pbkdf2_sha256'))
+        response = self.client.post(self.login_url, self.user_data)
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+        self.assertTrue(user.check_password(self.user_data['password']))
+
+    @override_settings(ARGON2_TIME_COST=2)
+    def test_argon2_password_rehashed_when_parameters_change(self):
+        with override_settings(ARGON2_TIME_COST=1):
+            user = self.create_user(make_password(self.user_data['password']))
+        self.assertIn('t=1', user.password)
+        response = self.client.post(self.login_url, self.user_data)
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertIn('m=1024,t=2,p=1', user.password)
+
+    def test_password_not_rehashed_on_failed_login(self):
+        password_hash = make_password(self.user_data['password'], hasher='pbkdf2_sha256')
+        user = self.create_user(password_hash)
+        response = self.client.post(self.login_url, {
+            'email': self.user_data['email'],
+            'password': 'wrong-password'
+        })
+        self.assertEqual(response.status_code, 403)
+        user.refresh_from_db()
+        self.assertEqual(user.password, password_hash)
+
+    def test_benchmark_password_hashers(self):
+        out = StringIO()
+        call_command('benchmark_password_hashers', seconds=0.05, all=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn('argon2', output)
+        self.assertIn('pbkdf2_sha256', output)
+        self.assertIn('hashes/s/core', output)
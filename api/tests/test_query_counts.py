@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import UserKey, VaultCollection, VaultItem, VaultTombstone
+from api.tests.mixins import QueryCountAssertionsMixin
+
+
+# Guards the read endpoints against N+1 regressions: the queries each one runs must stay the same
+# however many collections, items and deletions the vault has
+class TestQueryCounts(QueryCountAssertionsMixin, APITestCase):
+
+    def setUp(self):
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        UserKey.objects.create(user=self.user, encrypted_symmetric_key='somelonggobbledegook')
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.vault_item = VaultItem.objects.create(
+            encrypted_data='encrypted data', vault_collection_id=self.vault_collection.id)
+        self.client.login(**self.user_data)
+
+    def add_data(self):
+        for i in range(3):
+            vault_collection = VaultCollection.objects.create(name=f'folder {i}',
+                                                              user_id=self.user.id)
+            VaultItem.objects.bulk_create(
+                VaultItem(encrypted_data=f'encrypted data {j}',
+                          vault_collection_id=vault_collection.id)
+                for j in range(3))
+            VaultTombstone.objects.create(user=self.user, kind=VaultTombstone.VAULT_ITEM,
+                                          uuid=vault_collection.uuid)
+
+    def assertEndpointQueriesConstant(self, url, data=None):
+        make_request = lambda: self.client.get(url, data)  # noqa: E731
+        self.assertQueryCountConstant(make_request, self.add_data)
+        self.assertNoRepeatedQueries(make_request)
+
+    def test_vault_item_list(self):
+        self.assertEndpointQueriesConstant(reverse('vault_item-list'))
+
+    def test_vault_item_list_page(self):
+        self.assertEndpointQueriesConstant(reverse('vault_item-list'), {'page_size': 5})
+
+    def test_vault_item_detail(self):
+        self.assertEndpointQueriesConstant(
+            reverse('vault_item-detail', kwargs={'uuid': self.vault_item.uuid}))
+
+    def test_vault_item_export(self):
+        self.assertEndpointQueriesConstant(reverse('vault_item-export'))
+
+    def test_vault_collection_list(self):
+        self.assertEndpointQueriesConstant(reverse('vault_collection-list'))
+
+    def test_vault_collection_list_include(self):
+        self.assertEndpointQueriesConstant(reverse('vault_collection-list'),
+                                           {'include': 'items,item_count'})
+
+    def test_vault_sync(self):
+        self.assertEndpointQueriesConstant(reverse('vault_sync'))
+
+    def test_vault_version(self):
+        self.assertEndpointQueriesConstant(reverse('vault_version'))
+
+    def test_user_key(self):
+        self.assertEndpointQueriesConstant(reverse('user_key'))
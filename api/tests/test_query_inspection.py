@@ -0,0 +1,151 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem
+from api.tests.mixins import QueryCountAssertionsMixin
+from api.views import VaultCollectionViewSet
+from config.metrics import RequestMetrics
+from config.query_inspection import capture_queries, get_query_report, query_shape, \
+    reset_query_report
+from config.query_recorder import install, record_query, request_metrics
+
+
+class TestQueryShape(SimpleTestCase):
+
+    def test_parameter_lists_collapsed(self):
+        self.assertEqual(query_shape('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s)'),
+                         'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, ...)')
+        self.assertEqual(query_shape('INSERT INTO "a" ("x", "y") VALUES (%s, %s), (%s, %s)'),
+                         query_shape('INSERT INTO "a" ("x", "y") VALUES (%s, %s)'))
+
+    def test_literals_replaced(self):
+        self.assertEqual(query_shape("SELECT * FROM \"api_user\" WHERE id = 12 AND name = 'it''s'"),
+                         'SELECT * FROM "api_user" WHERE id = %s AND name = %s')
+
+    def test_savepoints_alike(self):
+        self.assertEqual(query_shape('SAVEPOINT "s140327679814528_x8"'),
+                         query_shape('SAVEPOINT "s140327679814528_x9"'))
+
+    def test_identifiers_kept(self):
+        sql = 'SELECT "api_vaultitem"."id" FROM "api_vaultitem" LIMIT 21'
+        self.assertEqual(query_shape(sql),
+                         'SELECT "api_vaultitem"."id" FROM "api_vaultitem" LIMIT %s')
+
+
+# The collections list asked to include items, with the prefetch taken out
+def get_queryset_without_prefetch(self):
+    return VaultCollection.objects.filter(user_id=self.request.user.id)
+
+
+class TestQueryInspection(QueryCountAssertionsMixin, APITestCase):
+
+    def setUp(self):
+        reset_query_report()
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        for i in range(4):
+            self.add_collection()
+        self.client.login(**self.user_data)
+        self.url = reverse('vault_collection-list')
+
+    def add_collection(self):
+        vault_collection = VaultCollection.objects.create(name='folder', user_id=self.user.id)
+        VaultItem.objects.create(encrypted_data='encrypted data',
+                                 vault_collection_id=vault_collection.id)
+
+    def list_with_items(self):
+        return self.client.get(self.url, {'include': 'items'})
+
+    def test_capture_nested(self):
+        with capture_queries() as outer:
+            VaultItem.objects.count()
+            with capture_queries() as inner:
+                VaultItem.objects.exists()
+        self.assertEqual(len(outer), 2)
+        self.assertEqual(len(inner), 1)
+
+    def test_recorded_once_for_metrics_and_inspection(self):
+        install()
+        install()
+        self.assertEqual(connection.execute_wrappers.count(record_query), 1)
+        metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        try:
+            with capture_queries() as log:
+                VaultItem.objects.count()
+        finally:
+            request_metrics.reset(token)
+        self.assertEqual(metrics.db_queries, 1)
+        self.assertEqual(len(log), 1)
+        self.assertEqual(metrics.db_seconds, log.seconds)
+
+    @mock.patch.object(VaultCollectionViewSet, 'get_queryset', get_queryset_without_prefetch)
+    def test_growing_query_count_fails(self):
+        with self.assertRaisesMessage(AssertionError, 'more of: SELECT "api_vaultitem"'):
+            self.assertQueryCountConstant(self.list_with_items, self.add_collection)
+
+    @mock.patch.object(VaultCollectionViewSet, 'get_queryset', get_queryset_without_prefetch)
+    def test_repeated_queries_fail(self):
+        with self.assertRaisesMessage(AssertionError, '5 times: SELECT "api_vaultitem"'):
+            self.assertNoRepeatedQueries(self.list_with_items, threshold=3)
+
+    def test_constant_query_count_passes(self):
+        self.assertQueryCountConstant(self.list_with_items, self.add_collection)
+        self.assertNoRepeatedQueries(self.list_with_items, threshold=3)
+
+    @override_settings(QUERY_INSPECTION_ENABLED=False)
+    def test_middleware_not_used(self):
+        self.assertEqual(self.client.get('/query_report').status_code, 404)
+
+    @override_settings(QUERY_INSPECTION_ENABLED=True, QUERY_INSPECTION_REPEAT_THRESHOLD=3,
+                       QUERY_INSPECTION_SLOW_MS=1000, METRICS_TOKEN='scrape-token')
+    @mock.patch.object(VaultCollectionViewSet, 'get_queryset', get_queryset_without_prefetch)
+    def test_middleware_flags_repeated_queries(self):
+        with self.assertLogs('config.query_inspection', 'WARNING') as logs:
+            self.list_with_items()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('GET vault_collection-list ran the same query 5 times', logs.output[0])
+        # Shapes only, the parameters are not logged
+        self.assertNotIn(str(self.user.id), logs.output[0].rpartition(':')[2])
+
+        report = self.client.get('/query_report',
+                                 HTTP_AUTHORIZATION='Bearer scrape-token').json()
+        endpoint = report['GET vault_collection-list']
+        self.assertEqual(endpoint['requests'], 1)
+        self.assertEqual(len(endpoint['repeated']), 1)
+        self.assertEqual(list(endpoint['repeated'].values()), [5])
+        self.assertEqual(report, get_query_report())
+
+    @override_settings(QUERY_INSPECTION_ENABLED=True, QUERY_INSPECTION_REPEAT_THRESHOLD=3,
+                       QUERY_INSPECTION_SLOW_MS=0)
+    def test_middleware_flags_slow_queries(self):
+        with self.assertLogs('config.query_inspection', 'WARNING') as logs:
+            self.list_with_items()
+        self.assertTrue(all('ran a query taking' in line for line in logs.output))
+        endpoint = get_query_report()['GET vault_collection-list']
+        self.assertEqual(len(endpoint['slow']), endpoint['max_queries'])
+        self.assertEqual(endpoint['repeated'], {})
+
+    @override_settings(QUERY_INSPECTION_ENABLED=True, QUERY_INSPECTION_SLOW_MS=1000,
+                       METRICS_TOKEN='scrape-token')
+    def test_report_token(self):
+        self.assertEqual(self.client.get('/query_report').status_code, 403)
+        with self.settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/query_report', HTTP_AUTHORIZATION='Bearer ')
+                             .status_code, 403)
+        response = self.client.get('/query_report', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_INSPECTION_ENABLED=True, QUERY_INSPECTION_SLOW_MS=1000)
+    async def test_middleware_async(self):
+        await self.async_client.get(self.url)
+        self.assertEqual(get_query_report()['GET vault_collection-list']['requests'], 1)
@@ -0,0 +1,96 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from config import readiness
+from config.readiness import NotReady, get_readiness
+
+
+@override_settings(READINESS_TIMEOUT=2, READINESS_CACHE_SECONDS=60)
+class TestReadiness(TestCase):
+
+    def setUp(self):
+        get_readiness().clear()
+
+    def test_health_touches_nothing(self):
+        with self.assertNumQueries(0), mock.patch.object(readiness.Readiness, 'get') as get:
+            response = self.client.get('/health')
+        self.assertEqual(response.content, b'OK')
+        get.assert_not_called()
+
+    def test_ready(self):
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok', 'checks': {
+            'database': 'ok', 'cache': 'ok', 'migrations': 'ok'}})
+
+    def test_result_kept(self):
+        check_database = mock.Mock()
+        with mock.patch.dict(readiness.CHECKS, database=check_database):
+            for _ in range(3):
+                self.assertEqual(self.client.get('/ready').status_code, 200)
+        check_database.assert_called_once()
+
+    @override_settings(READINESS_CACHE_SECONDS=0)
+    def test_result_expires(self):
+        check_database = mock.Mock()
+        with mock.patch.dict(readiness.CHECKS, database=check_database):
+            for _ in range(3):
+                self.client.get('/ready')
+        self.assertEqual(check_database.call_count, 3)
+
+    def test_database_unreachable(self):
+        with mock.patch.dict(readiness.CHECKS, database=mock.Mock(side_effect=OSError('down'))), \
+                self.assertLogs('config.readiness', 'ERROR'):
+            response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'unavailable')
+        self.assertEqual(response.json()['checks']['database'], 'failed')
+        self.assertNotIn('down', response.content.decode())
+
+    def test_unapplied_migrations(self):
+        with mock.patch('config.readiness.MigrationExecutor.migration_plan',
+                        return_value=[('api', '0099_pending')]):
+            response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['migrations'], 'unapplied')
+
+    @override_settings(READINESS_TIMEOUT=0.05)
+    def test_slow_check_times_out(self):
+        slow_check = mock.Mock(side_effect=lambda: time.sleep(0.5))
+        with mock.patch.dict(readiness.CHECKS, cache=slow_check):
+            start = time.monotonic()
+            response = self.client.get('/ready')
+            self.assertLess(time.monotonic() - start, 0.4)
+            self.assertEqual(response.json()['checks']['cache'], 'timeout')
+
+            # Still running, so it is not started a second time
+            get_readiness().clear()
+            response = self.client.get('/ready')
+        self.assertEqual(response.json()['checks']['cache'], 'timeout')
+        slow_check.assert_called_once()
+
+    def test_not_ready_message_reported(self):
+        with mock.patch.dict(readiness.CHECKS, cache=mock.Mock(side_effect=NotReady('failed'))):
+            response = self.client.get('/ready')
+        self.assertEqual(response.json()['checks']['cache'], 'failed')
+
+    # Another process probing the shared cache between the write and the read
+    def test_check_caches_concurrent(self):
+        cache = caches['default']
+        get = cache.get
+
+        def get_after_other_check(key, *args, **kwargs):
+            with mock.patch.object(cache, 'get', get):
+                readiness.check_caches()
+            return get(key, *args, **kwargs)
+
+        with mock.patch.object(cache, 'get', get_after_other_check):
+            readiness.check_caches()
+        self.assertFalse([key for key in cache._cache if 'readiness_check' in key])
+
+    async def test_ready_async(self):
+        response = await self.async_client.get('/ready')
+        self.assertEqual(response.status_code, 200)
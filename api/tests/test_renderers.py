@@ -0,0 +1,105 @@
+import datetime
+import decimal
+import io
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api import renderers
+from api.models import VaultCollection, VaultItem
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+
+
+class TestORJSONRenderer(SimpleTestCase):
+
+    def assertSameOutput(self, data, accepted_media_type=None):
+        self.assertEqual(ORJSONRenderer().render(data, accepted_media_type),
+                         JSONRenderer().render(data, accepted_media_type))
+
+    def test_vault_items(self):
+        item_uuid = str(uuid.uuid4())
+        self.assertSameOutput({item_uuid: {
+            'encrypted_data': 'U2FsdGVkX1+ZBn/ez9tLSw==',
+            'uuid': item_uuid,
+            'vault_collection': str(uuid.uuid4()),
+            'vault_collection_name': 'Dossiers signés',
+            'created_at': '2023-10-18T09:12:43.521312Z',
+            'modified_at': None,
+        }})
+
+    def test_python_types(self):
+        self.assertSameOutput({
+            'utc': datetime.datetime(2023, 10, 18, 9, 12, 43, 521312, tzinfo=datetime.timezone.utc),
+            'offset': datetime.datetime(2023, 10, 18, 9, 12, tzinfo=datetime.timezone(
+                datetime.timedelta(hours=2))),
+            'naive': datetime.datetime(2023, 10, 18, 9, 12, 43),
+            'date': datetime.date(2023, 10, 18),
+            'uuid': uuid.uuid4(),
+            'decimal': decimal.Decimal('1.5'),
+            'timedelta': datetime.timedelta(seconds=90),
+            'lazy': gettext_lazy('Not found.'),
+            'tuple': (1, True, None),
+            'big': 2 ** 70,
+        })
+
+    def test_escapes(self):
+        self.assertSameOutput(['line\u2028separator\u2029', '\x00\x1f\t"\\/', 'é€\U0001f600'])
+
+    def test_indent(self):
+        self.assertSameOutput({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_none(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameOutput({'uuid': uuid.uuid4()})
+
+
+class TestORJSONParser(SimpleTestCase):
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), parser_context={'encoding': 'utf-8'})
+
+    def test_same_data(self):
+        body = '{"encrypted_data": "données", "nested": [1, 2.5, null, true]}'.encode()
+        self.assertEqual(self.parse(ORJSONParser(), body), self.parse(JSONParser(), body))
+
+    def test_invalid_json(self):
+        for body in [b'', b'{"a": ', b'{"a": NaN}']:
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                self.parse(ORJSONParser(), body)
+
+
+class TestORJSONEndpoints(APITestCase):
+
+    def setUp(self):
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        vault_collection = VaultCollection.objects.create(name='folder1', user_id=self.user.id)
+        self.vault_item = VaultItem.objects.create(
+            encrypted_data='encrypted data', vault_collection_id=vault_collection.id)
+        self.client.login(**self.user_data)
+
+    def test_vault_items_rendered_like_json_renderer(self):
+        response = self.client.get(reverse('vault_item-list'))
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_invalid_json_body(self):
+        response = self.client.post(reverse('vault_item-list'), '{"encrypted_data": ',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.data['detail'])
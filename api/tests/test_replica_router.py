@@ -0,0 +1,96 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api.models import VaultItem
+from config.replica_router import ReplicaRouter, ReplicaRoutingMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'], DATABASE_REPLICA_PIN_SECONDS=10,
+                   DATABASE_REPLICA_PIN_CACHE_ALIAS='default')
+class TestReplicaRouting(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def make_request(self, method='get', user_id=None):
+        request = getattr(self.factory, method)('/vault_items/')
+        request.session = SessionStore()
+        if user_id is not None:
+            request.session[SESSION_KEY] = str(user_id)
+        return request
+
+    # Returns the response and the database the view would have read vault items from
+    def request(self, request):
+        read_db = []
+
+        def view(request):
+            read_db.append(self.router.db_for_read(VaultItem))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return response, read_db[0]
+
+    def test_safe_request_reads_from_replica(self):
+        response, read_db = self.request(self.make_request(user_id=1))
+        self.assertIn(read_db, ['replica_0', 'replica_1'])
+        self.assertEqual(response.cookies, {})
+
+    def test_write_pins_user_to_primary(self):
+        response, read_db = self.request(self.make_request('post', user_id=1))
+        self.assertEqual(read_db, 'default')
+
+        # From any client of the user, with or without cookies
+        response, read_db = self.request(self.make_request(user_id=1))
+        self.assertEqual(read_db, 'default')
+        response, read_db = self.request(self.make_request(user_id=2))
+        self.assertIn(read_db, ['replica_0', 'replica_1'])
+
+    def test_expired_pin_reads_from_replica(self):
+        with override_settings(DATABASE_REPLICA_PIN_SECONDS=0.1):
+            self.request(self.make_request('post', user_id=1))
+        time.sleep(0.2)
+        response, read_db = self.request(self.make_request(user_id=1))
+        self.assertIn(read_db, ['replica_0', 'replica_1'])
+
+    def test_anonymous_reads_from_replica(self):
+        self.request(self.make_request('post'))
+        response, read_db = self.request(self.make_request())
+        self.assertIn(read_db, ['replica_0', 'replica_1'])
+
+    def test_async_request_reads_from_replica(self):
+        read_db = []
+
+        async def view(request):
+            read_db.append(self.router.db_for_read(VaultItem))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        async_to_sync(middleware)(self.make_request(user_id=1))
+        self.assertIn(read_db[0], ['replica_0', 'replica_1'])
+
+        async_to_sync(middleware)(self.make_request('post', user_id=1))
+        async_to_sync(middleware)(self.make_request(user_id=1))
+        self.assertEqual(read_db[1:], ['default', 'default'])
+
+    def test_outside_request_reads_from_primary(self):
+        self.assertEqual(self.router.db_for_read(VaultItem), 'default')
+
+    def test_writes_and_migrations_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(VaultItem), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'api'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'api'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        response, read_db = self.request(self.make_request(user_id=1))
+        self.assertEqual(read_db, 'default')
+        self.request(self.make_request('post', user_id=1))
+        self.assertEqual(cache.get('primary_pin_1'), None)
@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class TestCachedSessions(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vault_items_url = reverse('vault_item-list')
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        vault_collection = VaultCollection.objects.create(name='folder1', user_id=self.user.id)
+        VaultItem.objects.create(encrypted_data='encrypted data 1',
+                                 vault_collection_id=vault_collection.id)
+
+    def test_vault_items_get_skips_session_table(self):
+        self.client.login(**self.user_data)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.vault_items_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'django_session' in query['sql']])
+
+    def test_logout_ends_cached_session(self):
+        self.client.login(**self.user_data)
+        self.client.logout()
+        response = self.client.get(self.vault_items_url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_warm_session_cache(self):
+        with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db'):
+            self.client.login(**self.user_data)
+        session_key = self.client.cookies['sessionid'].value
+        self.assertIsNone(cache.get(KEY_PREFIX + session_key))
+
+        out = StringIO()
+        call_command('warm_session_cache', stdout=out)
+        self.assertIn('Warmed 1 sessions', out.getvalue())
+        self.assertEqual(cache.get(KEY_PREFIX + session_key)['_auth_user_id'], str(self.user.id))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.vault_items_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'django_session' in query['sql']])
+
+    def test_benchmark_sessions(self):
+        out = StringIO()
+        call_command('benchmark_sessions', requests=2, items=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn('django.contrib.sessions.backends.db', output)
+        self.assertIn('django.contrib.sessions.backends.cached_db', output)
+        self.assertEqual(get_user_model().objects.count(), 1)
@@ -1,9 +1,13 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APITestCase
 
-from api.models import UserKey
+from api.models import UserKey, VaultCollection
 
 
 class TestSignupAPIView(APITestCase):
@@ -134,3 +138,41 @@ class TestSignupAPIView(APITestCase):
         self.assertEqual(len(users), 0)
         user_keys = UserKey.objects.all()
         self.assertEqual(len(user_keys), 0)
+
+
+class TestSignupTransaction(APITestCase):
+
+    def setUp(self):
+        self.signup_url = reverse('signup')
+        self.user_data = {
+            'email': 'bob@example.com',
+            'password': 'super-password',
+            'encrypted_symmetric_key': 'aV7XEg4EaWIivTcS76QcXPg7qD/'
+                                       'Kox7MdAU44pQwKrfPKqb2Yl5/7CcAzC7dqQf9PyelHwM0oSeY52T7'
+        }
+
+    def test_signup_statements(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.signup_url, self.user_data)
+        self.assertEqual(response.status_code, 201)
+        # No uniqueness SELECT and no vault_version UPDATE, only the three INSERTs
+        # inside one savepoint (a transaction outside of tests)
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEqual(statements, ['SAVEPOINT', 'INSERT', 'INSERT', 'INSERT', 'RELEASE'])
+
+    def test_signup_email_taken_without_pre_check(self):
+        # As if another signup for the same email committed after this one was validated
+        get_user_model().objects.create_user(email=self.user_data['email'],
+                                             password='other-password')
+        response = self.client.post(self.signup_url, self.user_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('user with this email already exists.', response.data['email'])
+        self.assertEqual(get_user_model().objects.count(), 1)
+        self.assertEqual(UserKey.objects.count(), 0)
+
+    def test_signup_failure_leaves_no_user(self):
+        with mock.patch.object(UserKey.objects, 'create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(self.signup_url, self.user_data)
+        self.assertEqual(get_user_model().objects.count(), 0)
+        self.assertEqual(VaultCollection.objects.count(), 0)
@@ -0,0 +1,216 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.models import UserKey
+from api.throttling import LoginEmailRateThrottle, LoginIPRateThrottle
+
+THROTTLE_RATES = {
+    'login_ip': '4/m',
+    'login_email': '3/h',
+    'signup_ip': '3/d',
+    'signup_email': '2/h',
+}
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                   'DEFAULT_THROTTLE_RATES': THROTTLE_RATES})
+class TestLoginThrottling(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.login_url = reverse('login')
+        self.user_data = {
+            'email': 'marion@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        UserKey.objects.create(user=self.user, encrypted_symmetric_key='somelonggobbledegook')
+
+    def login(self, email, remote_addr='10.0.0.1', password='wrong-password'):
+        return self.client.post(self.login_url, {'email': email, 'password': password},
+                                REMOTE_ADDR=remote_addr)
+
+    def test_throttled_per_ip(self):
+        for i in range(4):
+            self.assertEqual(self.login(f'user{i}@gmail.com').status_code, 403)
+        response = self.login('user5@gmail.com')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login('user6@gmail.com', remote_addr='10.0.0.2').status_code, 403)
+
+    def test_throttled_per_email(self):
+        for i in range(3):
+            self.assertEqual(self.login('Marion@gmail.com ', f'10.0.1.{i}').status_code, 403)
+        response = self.login('marion@gmail.com', '10.0.1.9', password='super-password')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.login('other@gmail.com', '10.0.1.9').status_code, 403)
+
+    def test_body_not_an_object(self):
+        for body in ([], 'marion@gmail.com', 42):
+            response = self.client.post(self.login_url, body, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_throttled_attempts_for_email_not_counted(self):
+        with mock.patch.object(LoginEmailRateThrottle, 'timer', return_value=3600 * 10):
+            for i in range(3):
+                self.login(self.user_data['email'], f'10.0.3.{i}')
+            # Someone else keeps trying the address from many IPs
+            for i in range(20):
+                self.assertEqual(self.login(self.user_data['email'], f'10.0.4.{i}').status_code,
+                                 429)
+        # Halfway into the next hour the three attempts that got through weigh 1.5
+        with mock.patch.object(LoginEmailRateThrottle, 'timer', return_value=3600 * 11.5):
+            response = self.login(self.user_data['email'], '10.0.3.9', 'super-password')
+        self.assertEqual(response.status_code, 200)
+
+    def test_successful_login_counted(self):
+        for i in range(3):
+            response = self.login(self.user_data['email'], f'10.0.2.{i}', 'super-password')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.login(self.user_data['email'], '10.0.2.9').status_code, 429)
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                   'DEFAULT_THROTTLE_RATES': THROTTLE_RATES})
+class TestSignupThrottling(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.signup_url = reverse('signup')
+
+    def signup(self, email, remote_addr='10.0.0.1'):
+        return self.client.post(self.signup_url, {
+            'email': email,
+            'password': 'super-password',
+            'encrypted_symmetric_key': 'aV7XEg4EaWIivTcS76QcXPg7qD'
+        }, REMOTE_ADDR=remote_addr)
+
+    def test_throttled_per_ip(self):
+        for i in range(3):
+            self.assertEqual(self.signup(f'bob{i}@example.com').status_code, 201)
+        self.assertEqual(self.signup('bob9@example.com').status_code, 429)
+
+    def test_body_not_an_object(self):
+        for body in ([], 'bob@example.com', 42):
+            response = self.client.post(self.signup_url, body, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_throttled_per_email(self):
+        self.assertEqual(self.signup('bob@example.com', '10.0.1.1').status_code, 201)
+        self.assertEqual(self.signup('bob@example.com', '10.0.1.2').status_code, 400)
+        self.assertEqual(self.signup('bob@example.com', '10.0.1.3').status_code, 429)
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                   'DEFAULT_THROTTLE_RATES': {'login_ip': '100/m',
+                                                              'login_email': '100/h'}},
+                   LOGIN_FAILURE_EMAIL_LIMIT=3, LOGIN_FAILURE_IP_LIMIT=5)
+class TestLoginFailureThrottle(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.login_url = reverse('login')
+        self.user_data = {
+            'email': 'marion@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        UserKey.objects.create(user=self.user, encrypted_symmetric_key='somelonggobbledegook')
+
+    def login(self, email, remote_addr='10.0.0.1', password='wrong-password'):
+        return self.client.post(self.login_url, {'email': email, 'password': password},
+                                REMOTE_ADDR=remote_addr)
+
+    def test_locked_out_email_rejected_before_hashing(self):
+        for i in range(3):
+            self.assertEqual(self.login('marion@gmail.com', f'10.0.1.{i}').status_code, 403)
+        with mock.patch('api.backends.run_in_hashing_pool') as run_in_hashing_pool, \
+                self.assertNumQueries(0):
+            response = self.login('marion@gmail.com', '10.0.1.9', password='super-password')
+        run_in_hashing_pool.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(settings.LOGIN_FAILURE_TIMEOUT))
+
+    def test_unknown_email_locked_out_the_same(self):
+        for i in range(3):
+            self.login('marion@gmail.com', f'10.0.1.{i}')
+            self.login('nobody@gmail.com', f'10.0.2.{i}')
+        known = self.login('marion@gmail.com', '10.0.1.9')
+        unknown = self.login('nobody@gmail.com', '10.0.2.9')
+        self.assertEqual(unknown.status_code, known.status_code)
+        self.assertEqual(unknown.content, known.content)
+
+    def test_locked_out_ip(self):
+        for i in range(5):
+            self.assertEqual(self.login(f'user{i}@gmail.com').status_code, 403)
+        self.assertEqual(self.login('marion@gmail.com', password='super-password').status_code, 429)
+        response = self.login('marion@gmail.com', '10.0.0.2', password='super-password')
+        self.assertEqual(response.status_code, 200)
+
+    def test_success_clears_email_failures(self):
+        for i in range(2):
+            self.login('marion@gmail.com', f'10.0.1.{i}')
+        response = self.login('marion@gmail.com', '10.0.1.5', 'super-password')
+        self.assertEqual(response.status_code, 200)
+        for i in range(2):
+            self.assertEqual(self.login('marion@gmail.com', f'10.0.1.{i}').status_code, 403)
+
+    def test_invalid_request_not_counted(self):
+        for i in range(3):
+            self.assertEqual(self.client.post(self.login_url, {'email': 'marion@gmail.com'},
+                                              REMOTE_ADDR=f'10.0.1.{i}').status_code, 400)
+        self.assertEqual(self.login('marion@gmail.com', password='super-password').status_code, 200)
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                   'DEFAULT_THROTTLE_RATES': {'login_ip': '10/m'}})
+class TestSlidingWindowRateThrottle(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = 6000.0  # The start of a one minute window
+
+    def allow(self, requests=1):
+        throttle = LoginIPRateThrottle()
+        throttle.timer = lambda: self.now
+        request = APIRequestFactory().post(reverse('login'))
+        allowed = [throttle.allow_request(request, None) for _ in range(requests)]
+        return allowed, throttle
+
+    def test_previous_window_weighted(self):
+        allowed, throttle = self.allow(10)
+        self.assertTrue(all(allowed))
+        self.assertEqual(self.allow()[0], [False])
+
+        # Halfway through the next window, half of the previous window's 11 attempts still count
+        self.now += 90
+        allowed, throttle = self.allow(5)
+        self.assertEqual(allowed, [True, True, True, True, False])
+
+        # After another full window only the 5 attempts of the last one remain, halved
+        self.now += 60
+        allowed, throttle = self.allow(8)
+        self.assertEqual(allowed.count(True), 7)
+
+    def test_wait(self):
+        allowed, throttle = self.allow(11)
+        # The 11 attempts must decay to 9 out of the sliding window before the next is allowed
+        self.assertAlmostEqual(throttle.wait(), 60 * (2 - 9 / 11))
+
+        self.now += 90
+        allowed, throttle = self.allow(5)
+        self.assertEqual(allowed[-1], False)
+        # 5 attempts in this window, so the previous one's 11 must weigh 4 or less
+        self.assertAlmostEqual(throttle.wait(), 60 * (1 - 4 / 11 - 0.5))
+
+    def test_constant_memory(self):
+        self.allow(100)
+        allowed, throttle = self.allow()
+        self.assertEqual(cache.get(f'{throttle.key}_100'), 101)
@@ -0,0 +1,115 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import UserKey
+from api.user_key_cache import get_user_key_cache
+
+
+class TestUserKeyCache(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_user_key_cache().clear()
+        self.user_key_url = reverse('user_key')
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.user_key = UserKey.objects.create(
+            user=self.user,
+            encrypted_symmetric_key='somelonggobbledegookthatlookslikeitsabase64encodedstring'
+        )
+
+    def test_user_key_served_from_cache(self):
+        self.client.login(**self.user_data)
+        with CaptureQueriesContext(connection) as first_request:
+            response = self.client.get(self.user_key_url)
+        with CaptureQueriesContext(connection) as second_request:
+            cached_response = self.client.get(self.user_key_url)
+        self.assertEqual(len(second_request), len(first_request) - 1)
+        self.assertEqual(cached_response.data, response.data)
+        self.assertEqual(get_user_key_cache().stats()['local_hits'], 1)
+
+    def test_login_uses_cache(self):
+        get_user_key_cache().get(self.user.id)
+        response = self.client.post(reverse('login'), self.user_data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['encrypted_symmetric_key'],
+                         self.user_key.encrypted_symmetric_key)
+        self.assertEqual(get_user_key_cache().stats()['local_hits'], 1)
+
+    def test_user_key_save_invalidates(self):
+        self.client.login(**self.user_data)
+        self.client.get(self.user_key_url)
+        self.user_key.encrypted_symmetric_key = 'anewsymmetrickey'
+        self.user_key.save()
+        response = self.client.get(self.user_key_url)
+        self.assertEqual(response.data['encrypted_symmetric_key'], 'anewsymmetrickey')
+
+    def test_user_key_delete_invalidates(self):
+        self.client.login(**self.user_data)
+        self.client.get(self.user_key_url)
+        self.user_key.delete()
+        response = self.client.get(self.user_key_url)
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(USER_KEY_CACHE_LOCAL_TIMEOUT=0)
+    @mock.patch('api.user_key_cache.is_shared_cache', return_value=True)
+    def test_expired_local_entry_served_from_shared_cache(self, is_shared_cache):
+        get_user_key_cache().get(self.user.id)
+        with self.assertNumQueries(0):
+            user_key = get_user_key_cache().get(self.user.id)
+        self.assertEqual(user_key.encrypted_symmetric_key, self.user_key.encrypted_symmetric_key)
+        stats = get_user_key_cache().stats()
+        self.assertEqual((stats['local_hits'], stats['shared_hits'], stats['misses']), (0, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    @override_settings(USER_KEY_CACHE_MAX_ENTRIES=1)
+    def test_local_entries_bounded(self):
+        other_user = get_user_model().objects.create_user(
+            email='pippa2@gmail.com', password='super-password')
+        UserKey.objects.create(user=other_user, encrypted_symmetric_key='otherkey')
+        get_user_key_cache().get(self.user.id)
+        get_user_key_cache().get(other_user.id)
+        self.assertEqual(get_user_key_cache().stats()['entries'], 1)
+
+    def test_missing_user_key_not_cached(self):
+        self.user_key.delete()
+        self.assertIsNone(get_user_key_cache().get(self.user.id))
+        self.assertEqual(get_user_key_cache().stats()['entries'], 0)
+
+    def test_stale_entry_set_after_invalidation_ignored(self):
+        user_key_cache = get_user_key_cache()
+        version = cache.get(user_key_cache.version_key(self.user.id), 0)
+        user_key_cache.invalidate(self.user.id)
+        # A request that read the old key before the change stores it after the invalidation
+        stale = dict(user_key_cache.load(self.user.id), encrypted_symmetric_key='oldkey')
+        cache.set(user_key_cache.cache_key(self.user.id), (version, stale))
+        user_key_cache.clear()
+        user_key = user_key_cache.get(self.user.id)
+        self.assertEqual(user_key.encrypted_symmetric_key, self.user_key.encrypted_symmetric_key)
+
+    def test_invalidate_after_version_evicted(self):
+        user_key_cache = get_user_key_cache()
+        user_key_cache.get(self.user.id)
+        cache.delete(user_key_cache.version_key(self.user.id))
+        user_key_cache.invalidate(self.user.id)
+        self.assertEqual(cache.get(user_key_cache.version_key(self.user.id)), 1)
+
+    @override_settings(USER_KEY_CACHE_TIMEOUT=3600, USER_KEY_CACHE_LOCAL_TIMEOUT=30)
+    def test_per_process_cache_timeout_capped(self):
+        self.assertEqual(get_user_key_cache().timeout, 30)
+
+    @override_settings(USER_KEY_CACHE_TIMEOUT=3600, USER_KEY_CACHE_LOCAL_TIMEOUT=30, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_shared_cache_timeout_kept(self):
+        self.assertEqual(get_user_key_cache().timeout, 3600)
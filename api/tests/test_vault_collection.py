@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APITestCase
 
-from api.models import VaultCollection, VaultItem
+from api.models import VaultCollection, VaultItem, VaultTombstone
 
 
 class TestCreateVaultCollectionViewSet(APITestCase):
@@ -110,6 +112,72 @@ class TestGetVaultCollectionViewSet(APITestCase):
             'Authentication credentials were not provided.', response.data['detail'])
 
 
+class TestIncludeVaultCollectionViewSet(APITestCase):
+
+    def setUp(self):
+        self.vault_collections_url = reverse('vault_collection-list')
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.vault_item1 = VaultItem.objects.create(
+            encrypted_data='encrypted data 1', vault_collection_id=self.vault_collection.id)
+        self.vault_item2 = VaultItem.objects.create(
+            encrypted_data='encrypted data 2', vault_collection_id=self.vault_collection.id)
+        self.client.login(**self.user_data)
+
+    def get_folder1(self, response):
+        return next(collection for collection in response.data
+                    if collection['uuid'] == str(self.vault_collection.uuid))
+
+    def test_vault_collections_get_lean_by_default(self):
+        # session, user and the collections, without their items
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.vault_collections_url)
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('api_vaultitem', queries.captured_queries[-1]['sql'])
+        self.assertEqual(set(self.get_folder1(response)), {'name', 'uuid'})
+
+    def test_vault_collections_get_include_items(self):
+        # session, user, the collections and one query for all of their items
+        with self.assertNumQueries(4):
+            response = self.client.get(self.vault_collections_url, {'include': 'items'})
+        self.assertEqual(response.status_code, 200)
+        vault_items = self.get_folder1(response)['vault_items']
+        self.assertEqual(list(vault_items),
+                         [str(self.vault_item1.uuid), str(self.vault_item2.uuid)])
+        self.assertEqual(vault_items[str(self.vault_item1.uuid)]['encrypted_data'],
+                         'encrypted data 1')
+        self.assertEqual(vault_items[str(self.vault_item1.uuid)]['vault_collection_name'],
+                         'folder1')
+        self.assertNotIn('item_count', self.get_folder1(response))
+
+    def test_vault_collections_get_include_item_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.vault_collections_url, {'include': 'item_count'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_folder1(response)['item_count'], 2)
+        self.assertEqual([collection['item_count'] for collection in response.data
+                          if collection['name'] == 'Default'], [0])
+        self.assertNotIn('vault_items', self.get_folder1(response))
+
+    def test_vault_collection_get_include_items_and_item_count(self):
+        response = self.client.get(
+            reverse('vault_collection-detail', kwargs={'uuid': self.vault_collection.uuid}),
+            {'include': 'items,item_count'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['item_count'], 2)
+        self.assertEqual(len(response.data['vault_items']), 2)
+
+    def test_vault_collections_get_include_invalid(self):
+        response = self.client.get(self.vault_collections_url, {'include': 'items,secrets'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('"secrets" is not a valid choice.', response.data['include'])
+
+
 class TestUpdateVaultCollectionViewSet(APITestCase):
 
     def setUp(self):
@@ -244,6 +312,17 @@ class TestDeleteVaultCollectionViewSet(APITestCase):
         self.assertEqual(len(vault_collection), 0)
         self.assertEqual(len(vault_item), 0)
 
+    def test_vault_collection_delete_locks_before_reading_items(self):
+        self.client.login(email='pippa1@gmail.com', password='super-password')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(self.vault_collection_url)
+        sql = [query['sql'] for query in queries]
+        locked = next(i for i, query in enumerate(sql) if query.endswith('FOR UPDATE'))
+        read = next(i for i, query in enumerate(sql)
+                    if query.startswith('SELECT "api_vaultitem"."uuid"'))
+        self.assertLess(locked, read)
+        self.assertEqual(VaultTombstone.objects.filter(uuid=self.vault_item.uuid).count(), 1)
+
     def test_vault_collection_delete_collection_not_exist(self):
         self.client.login(email='pippa1@gmail.com', password='super-password')
         vault_collection_url = reverse('vault_collection-detail', kwargs={
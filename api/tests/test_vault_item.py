@@ -1,4 +1,8 @@
+import json
+
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APITestCase
@@ -170,6 +174,31 @@ class TestCreateVaultItemViewSet(APITestCase):
             vault_collection_id=self.vault_collection.id)
         self.assertEqual(len(vault_item), 0)
 
+    def test_vault_item_create_query_count(self):
+        self.client.login(email='pippa1@gmail.com', password='super-password')
+        # session, user, the collection lookup that also checks ownership, and in a savepoint the
+        # vault_version UPDATE, reading the new version back and the INSERT
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.vault_item_url, {
+                'encrypted_data': 'encrypted data',
+                'vault_collection': self.vault_collection.uuid
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(queries), 8)
+        self.assertEqual(sum('"api_vaultcollection"' in query['sql']
+                             for query in queries.captured_queries), 1)
+        self.assertEqual(response.data['vault_collection_name'], self.vault_collection.name)
+
+    def test_vault_item_create_vault_collection_belongs_to_other_user_query_count(self):
+        self.client.login(email='pippa1@gmail.com', password='super-password')
+        # session, user and the collection lookup, nothing is written
+        with self.assertNumQueries(3):
+            response = self.client.post(self.vault_item_url, {
+                'encrypted_data': 'encrypted data',
+                'vault_collection': self.other_user_vc.uuid
+            })
+        self.assertEqual(response.status_code, 404)
+
 
 class TestUpdateVaultItemViewSet(APITestCase):
 
@@ -345,6 +374,34 @@ class TestUpdateVaultItemViewSet(APITestCase):
             vault_item.encrypted_data, self.encrypted_data)
         self.assertEqual(vault_item.vault_collection, self.vault_collection)
 
+    def test_vault_item_update_query_count(self):
+        self.client.login(email='pippa1@gmail.com', password='super-password')
+        vc = VaultCollection.objects.create(
+            name='collection', user_id=self.user.id)
+        # session, user, the vault item, the collection lookup that also checks ownership, and in a
+        # savepoint the vault_version UPDATE, reading the new version back and the UPDATE
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.vault_item_url, {
+                'encrypted_data': 'updated encrypted data',
+                'vault_collection': vc.uuid
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 9)
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(sum(sql.startswith('UPDATE "api_vaultitem"') for sql in statements), 1)
+        self.assertFalse(any(sql.startswith('INSERT') for sql in statements))
+        self.assertEqual(response.data['vault_collection_name'], vc.name)
+
+    def test_vault_item_update_encrypted_data_query_count(self):
+        self.client.login(email='pippa1@gmail.com', password='super-password')
+        # session, user, the vault item, and in a savepoint the vault_version UPDATE, reading the
+        # new version back and the UPDATE
+        with self.assertNumQueries(8):
+            response = self.client.patch(self.vault_item_url, {
+                'encrypted_data': 'updated encrypted data',
+            })
+        self.assertEqual(response.status_code, 200)
+
 
 class TestGetVaultItemViewSet(APITestCase):
 
@@ -404,6 +461,36 @@ class TestGetVaultItemViewSet(APITestCase):
         response = self.client.get(self.vault_items_url)
         self.assertEqual(response.status_code, 403)
 
+    def test_vault_items_get_query_count_constant(self):
+        self.client.login(email='pippa1@gmail.com', password='super-password')
+        with CaptureQueriesContext(connection) as few_items:
+            response = self.client.get(self.vault_items_url)
+        self.assertEqual(len(response.data), 2)
+
+        other_vc = VaultCollection.objects.create(
+            name='folder4', user_id=self.user.id)
+        VaultItem.objects.bulk_create([
+            VaultItem(encrypted_data=f'encrypted data {i}', vault_collection_id=other_vc.id)
+            for i in range(20)
+        ])
+        with CaptureQueriesContext(connection) as many_items:
+            response = self.client.get(self.vault_items_url)
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(len(few_items), len(many_items))
+        self.assertEqual(response.data[str(self.vault_item1.uuid)]['vault_collection_name'],
+                         self.vault_collection.name)
+
+    def test_vault_item_get_query_count(self):
+        self.client.login(email='pippa1@gmail.com', password='super-password')
+        vault_item_url = reverse('vault_item-detail', kwargs={
+            'uuid': self.vault_item1.uuid})
+        # session, user, and the vault item joined with its collection
+        with self.assertNumQueries(3):
+            response = self.client.get(vault_item_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['vault_collection'], self.vault_collection.uuid)
+        self.assertEqual(response.data['vault_collection_name'], self.vault_collection.name)
+
 
 class TestDeleteVaultItemViewSet(APITestCase):
 
@@ -474,3 +561,85 @@ class TestDeleteVaultItemViewSet(APITestCase):
             id=self.vault_item.id)
         self.assertEqual(response.status_code, 403)
         self.assertEqual(len(vault_item), 1)
+
+
+class TestExportVaultItemViewSet(APITestCase):
+
+    def setUp(self):
+        self.vault_items_url = reverse('vault_item-list')
+        self.vault_items_export_url = reverse('vault_item-export')
+
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        VaultItem.objects.bulk_create([
+            VaultItem(encrypted_data=f'encrypted data {i}  ',
+                      vault_collection_id=self.vault_collection.id)
+            for i in range(12)
+        ])
+
+        self.other_user = get_user_model().objects.create_user(
+            email='pippa2@gmail.com', password='super-password')
+        self.other_user_vc = VaultCollection.objects.create(
+            name='folder2', user_id=self.other_user.id)
+        self.other_user_vi = VaultItem.objects.create(
+            encrypted_data='encrypted data other user', vault_collection_id=self.other_user_vc.id)
+
+    def test_vault_items_export_success(self):
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_items_export_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        exported = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(exported), 12)
+        self.assertNotIn(str(self.other_user_vi.uuid), exported)
+
+        listed = self.client.get(self.vault_items_url)
+        self.assertEqual(exported, json.loads(listed.content))
+
+    def test_vault_items_export_empty_vault(self):
+        self.client.login(email='pippa2@gmail.com', password='super-password')
+        self.other_user_vi.delete()
+        response = self.client.get(self.vault_items_export_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'{}')
+
+    def test_vault_items_export_user_not_authenticated(self):
+        response = self.client.get(self.vault_items_export_url)
+        self.assertEqual(response.status_code, 403)
+
+
+class TestVaultItemOwner(APITestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='pippa1@gmail.com', password='super-password')
+        self.other_user = get_user_model().objects.create_user(
+            email='pippa2@gmail.com', password='super-password')
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+
+    def test_owner_copied_from_collection(self):
+        created = VaultItem.objects.create(encrypted_data='encrypted data',
+                                           vault_collection_id=self.vault_collection.id)
+        VaultItem.objects.bulk_create([
+            VaultItem(encrypted_data='encrypted data', vault_collection_id=self.vault_collection.id),
+            VaultItem(encrypted_data='encrypted data', vault_collection=self.vault_collection),
+        ])
+        self.assertEqual(created.user_id, self.user.id)
+        self.assertEqual(set(VaultItem.objects.values_list('user_id', flat=True)), {self.user.id})
+
+    def test_owner_follows_moved_collection(self):
+        VaultItem.objects.create(encrypted_data='encrypted data',
+                                 vault_collection_id=self.vault_collection.id)
+        vault_collection = VaultCollection.objects.get(id=self.vault_collection.id)
+        with self.assertNumQueries(1):
+            vault_collection.save()
+        vault_collection.user = self.other_user
+        vault_collection.save()
+        self.assertEqual(VaultItem.objects.get().user_id, self.other_user.id)
@@ -0,0 +1,176 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem, VaultTombstone
+from api.serializers import VaultItemBulkSerializer
+
+
+class TestBulkVaultItemViewSet(APITestCase):
+
+    def setUp(self):
+        self.vault_item_bulk_url = reverse('vault_item-bulk')
+
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.other_vault_collection = VaultCollection.objects.create(
+            name='folder2', user_id=self.user.id)
+        self.vault_item1 = VaultItem.objects.create(
+            encrypted_data='encrypted data 1', vault_collection_id=self.vault_collection.id)
+        self.vault_item2 = VaultItem.objects.create(
+            encrypted_data='encrypted data 2', vault_collection_id=self.vault_collection.id)
+
+        self.other_user_data = {
+            'email': 'pippa2@gmail.com',
+            'password': 'super-password'
+        }
+        self.other_user = get_user_model().objects.create_user(**self.other_user_data)
+        self.other_user_vc = VaultCollection.objects.create(
+            name='folder3', user_id=self.other_user.id)
+        self.other_user_vi = VaultItem.objects.create(
+            encrypted_data='encrypted data other user', vault_collection_id=self.other_user_vc.id)
+
+    def test_vault_item_bulk_success(self):
+        self.client.login(**self.user_data)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': [
+            {'op': 'create', 'encrypted_data': 'new encrypted data',
+             'vault_collection': str(self.vault_collection.uuid)},
+            {'op': 'update', 'uuid': str(self.vault_item1.uuid),
+             'encrypted_data': 'updated encrypted data',
+             'vault_collection': str(self.other_vault_collection.uuid)},
+            {'op': 'delete', 'uuid': str(self.vault_item2.uuid)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.data['results']
+        self.assertEqual([result['op'] for result in results], ['create', 'update', 'delete'])
+        created = VaultItem.objects.get(uuid=results[0]['uuid'])
+        self.assertEqual(created.encrypted_data, 'new encrypted data')
+        self.assertEqual(created.vault_collection, self.vault_collection)
+        self.assertEqual(results[0]['vault_item']['vault_collection_name'],
+                         self.vault_collection.name)
+
+        vault_item1 = VaultItem.objects.get(id=self.vault_item1.id)
+        self.assertEqual(vault_item1.encrypted_data, 'updated encrypted data')
+        self.assertEqual(vault_item1.vault_collection, self.other_vault_collection)
+        self.assertGreater(vault_item1.modified_at, self.vault_item1.modified_at)
+        self.assertEqual(results[1]['vault_item']['vault_collection_name'],
+                         self.other_vault_collection.name)
+
+        self.assertFalse(VaultItem.objects.filter(id=self.vault_item2.id).exists())
+        self.assertTrue(VaultTombstone.objects.filter(
+            user=self.user, uuid=self.vault_item2.uuid).exists())
+
+    def test_vault_item_bulk_query_count_constant(self):
+        self.client.login(**self.user_data)
+
+        def create_operations(count):
+            return {'operations': [
+                {'op': 'create', 'encrypted_data': f'encrypted data {i}',
+                 'vault_collection': str(self.vault_collection.uuid)}
+                for i in range(count)
+            ]}
+
+        with CaptureQueriesContext(connection) as few_operations:
+            response = self.client.post(self.vault_item_bulk_url, create_operations(2),
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as many_operations:
+            response = self.client.post(self.vault_item_bulk_url, create_operations(50),
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few_operations), len(many_operations))
+        self.assertEqual(VaultItem.objects.filter(vault_collection=self.vault_collection).count(),
+                         54)
+
+    def test_vault_item_bulk_vault_collection_belongs_to_other_user(self):
+        self.client.login(**self.user_data)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': [
+            {'op': 'update', 'uuid': str(self.vault_item1.uuid),
+             'encrypted_data': 'updated encrypted data'},
+            {'op': 'create', 'encrypted_data': 'new encrypted data',
+             'vault_collection': str(self.other_user_vc.uuid)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['operations']
+        self.assertEqual(errors[0], {})
+        self.assertIn('User does not own VaultCollection', errors[1]['vault_collection'])
+        self.assertEqual(VaultItem.objects.get(id=self.vault_item1.id).encrypted_data,
+                         'encrypted data 1')
+        self.assertEqual(VaultItem.objects.filter(vault_collection=self.other_user_vc).count(), 1)
+
+    def test_vault_item_bulk_vault_item_belongs_to_other_user(self):
+        self.client.login(**self.user_data)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': [
+            {'op': 'delete', 'uuid': str(self.other_user_vi.uuid)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Not found.', response.data['operations'][0]['uuid'])
+        self.assertTrue(VaultItem.objects.filter(id=self.other_user_vi.id).exists())
+
+    def test_vault_item_bulk_duplicate_vault_item(self):
+        self.client.login(**self.user_data)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': [
+            {'op': 'update', 'uuid': str(self.vault_item1.uuid), 'encrypted_data': 'updated'},
+            {'op': 'delete', 'uuid': str(self.vault_item1.uuid)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Only one operation per VaultItem is allowed.',
+                      response.data['operations'][1]['uuid'])
+        self.assertTrue(VaultItem.objects.filter(id=self.vault_item1.id).exists())
+
+    def test_vault_item_bulk_operation_fields_missing(self):
+        self.client.login(**self.user_data)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': [
+            {'op': 'create'},
+            {'op': 'update'},
+            {'op': 'rename', 'uuid': str(self.vault_item1.uuid)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['operations']
+        self.assertIn('This field is required.', errors[0]['encrypted_data'])
+        self.assertIn('This field is required.', errors[0]['vault_collection'])
+        self.assertIn('This field is required.', errors[1]['uuid'])
+        self.assertIn('"rename" is not a valid choice.', errors[2]['op'])
+
+    def test_vault_item_bulk_create_with_uuid(self):
+        self.client.login(**self.user_data)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': [
+            {'op': 'create', 'uuid': str(self.vault_item1.uuid), 'encrypted_data': 'data',
+             'vault_collection': str(self.vault_collection.uuid)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('VaultItem uuids are assigned by the server.',
+                      response.data['operations'][0]['uuid'])
+
+    def test_vault_item_bulk_operations_empty(self):
+        self.client.login(**self.user_data)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('This list may not be empty.', response.data['operations']['non_field_errors'])
+
+    def test_vault_item_bulk_too_many_operations(self):
+        self.client.login(**self.user_data)
+        operations = [{'op': 'delete', 'uuid': str(self.vault_item1.uuid)}] * \
+            (VaultItemBulkSerializer.MAX_OPERATIONS + 1)
+        response = self.client.post(self.vault_item_bulk_url, {'operations': operations},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'Ensure this field has no more than {VaultItemBulkSerializer.MAX_OPERATIONS}'
+                      ' operations.', response.data['operations'])
+        self.assertTrue(VaultItem.objects.filter(id=self.vault_item1.id).exists())
+
+    def test_vault_item_bulk_user_not_logged_in(self):
+        response = self.client.post(self.vault_item_bulk_url, {'operations': [
+            {'op': 'delete', 'uuid': str(self.vault_item1.uuid)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(VaultItem.objects.filter(id=self.vault_item1.id).exists())
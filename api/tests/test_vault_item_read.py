@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem
+from api.serializers import VaultItemReadSerializer, VaultItemSerializer
+
+
+class TestVaultItemReadSerializer(APITestCase):
+
+    def setUp(self):
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='Dossiers signés', user_id=self.user.id)
+        self.vault_items = [
+            VaultItem.objects.create(encrypted_data=f'encrypted data {i}',
+                                     vault_collection_id=self.vault_collection.id)
+            for i in range(3)
+        ]
+        self.client.login(**self.user_data)
+
+    # What VaultItemSerializer returns for the user's items, keyed by uuid
+    def expected(self):
+        vault_items = VaultItem.objects.select_related('vault_collection').filter(
+            vault_collection__user_id=self.user.id)
+        return {item['uuid']: item for item in VaultItemSerializer(vault_items, many=True).data}
+
+    def test_same_representation(self):
+        rows = VaultItem.objects.filter(vault_collection__user_id=self.user.id).values(
+            *VaultItemReadSerializer.values)
+        serializer = VaultItemReadSerializer()
+        data = map(serializer.to_representation, rows)
+        self.assertEqual({item['uuid']: item for item in data}, self.expected())
+
+    def test_same_representation_in_other_timezone(self):
+        with timezone.override('Europe/Paris'):
+            self.test_same_representation()
+
+    def test_list(self):
+        response = self.client.get(reverse('vault_item-list'))
+        self.assertEqual(response.data, self.expected())
+
+    def test_list_page(self):
+        response = self.client.get(reverse('vault_item-list'), {'page_size': 2})
+        self.assertEqual(len(response.data), 2)
+        page = self.client.get(reverse('vault_item-list'),
+                               {'page_size': 2, 'cursor': response['X-Next-Cursor']})
+        self.assertEqual({**response.data, **page.data}, self.expected())
+
+    def test_retrieve(self):
+        vault_item = self.vault_items[0]
+        response = self.client.get(reverse('vault_item-detail', kwargs={'uuid': vault_item.uuid}))
+        self.assertEqual(response.data, self.expected()[str(vault_item.uuid)])
+
+    def test_retrieve_not_found(self):
+        response = self.client.get(reverse('vault_item-detail', kwargs={'uuid': 'not-a-uuid'}))
+        self.assertEqual(response.status_code, 404)
+
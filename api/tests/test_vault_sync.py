@@ -0,0 +1,253 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem, VaultTombstone
+from config.replica_router import ReplicaRouter
+
+
+class TestVaultSyncAPIView(APITestCase):
+
+    def setUp(self):
+        self.vault_sync_url = reverse('vault_sync')
+
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.vault_item1 = VaultItem.objects.create(
+            encrypted_data='encrypted data 1', vault_collection_id=self.vault_collection.id)
+        self.vault_item2 = VaultItem.objects.create(
+            encrypted_data='encrypted data 2', vault_collection_id=self.vault_collection.id)
+
+        self.other_user_data = {
+            'email': 'pippa2@gmail.com',
+            'password': 'super-password'
+        }
+        self.other_user = get_user_model().objects.create_user(**self.other_user_data)
+        self.other_user_vc = VaultCollection.objects.create(
+            name='folder2', user_id=self.other_user.id)
+        self.other_user_vi = VaultItem.objects.create(
+            encrypted_data='encrypted data 3', vault_collection_id=self.other_user_vc.id)
+
+    def test_vault_sync_full(self):
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_sync_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('cursor', response.data)
+        self.assertEqual(len(response.data['vault_items']), 2)
+        self.assertIn(str(self.vault_item1.uuid), response.data['vault_items'])
+        self.assertIn(str(self.vault_item2.uuid), response.data['vault_items'])
+        # The default collection created at signup and folder1
+        self.assertEqual(len(response.data['vault_collections']), 2)
+        self.assertIn(str(self.vault_collection.uuid), response.data['vault_collections'])
+        self.assertEqual(response.data['deleted_vault_items'], [])
+        self.assertEqual(response.data['deleted_vault_collections'], [])
+
+    def test_vault_sync_since_cursor_returns_only_changes(self):
+        self.client.login(**self.user_data)
+        cursor = self.client.get(self.vault_sync_url).data['cursor']
+
+        self.client.patch(reverse('vault_item-detail', kwargs={'uuid': self.vault_item1.uuid}),
+                          {'encrypted_data': 'updated encrypted data'})
+        response = self.client.get(self.vault_sync_url, {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['vault_items']), [str(self.vault_item1.uuid)])
+        self.assertEqual(response.data['vault_items'][str(self.vault_item1.uuid)]['encrypted_data'],
+                         'updated encrypted data')
+        self.assertEqual(response.data['vault_collections'], {})
+        self.assertEqual(response.data['deleted_vault_items'], [])
+
+    def test_vault_sync_nothing_changed(self):
+        self.client.login(**self.user_data)
+        cursor = self.client.get(self.vault_sync_url).data['cursor']
+        response = self.client.get(self.vault_sync_url, {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['vault_items'], {})
+        self.assertEqual(response.data['vault_collections'], {})
+        self.assertEqual(response.data['deleted_vault_items'], [])
+        self.assertEqual(response.data['deleted_vault_collections'], [])
+
+    def test_vault_sync_vault_item_deleted(self):
+        self.client.login(**self.user_data)
+        cursor = self.client.get(self.vault_sync_url).data['cursor']
+
+        self.client.delete(reverse('vault_item-detail', kwargs={'uuid': self.vault_item1.uuid}))
+        response = self.client.get(self.vault_sync_url, {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['vault_items'], {})
+        self.assertEqual(response.data['deleted_vault_items'], [self.vault_item1.uuid])
+
+    def test_vault_sync_vault_collection_deleted(self):
+        self.client.login(**self.user_data)
+        cursor = self.client.get(self.vault_sync_url).data['cursor']
+
+        self.client.delete(reverse('vault_collection-detail',
+                                   kwargs={'uuid': self.vault_collection.uuid}))
+        response = self.client.get(self.vault_sync_url, {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted_vault_collections'], [self.vault_collection.uuid])
+        self.assertCountEqual(response.data['deleted_vault_items'],
+                              [self.vault_item1.uuid, self.vault_item2.uuid])
+
+    def test_vault_sync_other_user_changes_not_returned(self):
+        self.client.login(**self.user_data)
+        cursor = self.client.get(self.vault_sync_url).data['cursor']
+
+        self.client.login(**self.other_user_data)
+        self.client.delete(reverse('vault_item-detail', kwargs={'uuid': self.other_user_vi.uuid}))
+        VaultItem.objects.create(
+            encrypted_data='encrypted data 4', vault_collection_id=self.other_user_vc.id)
+
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_sync_url, {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['vault_items'], {})
+        self.assertEqual(response.data['deleted_vault_items'], [])
+
+    def test_vault_sync_invalid_cursor(self):
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_sync_url, {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid sync cursor.', response.data['since'])
+
+    def test_vault_sync_change_stamped_before_cursor(self):
+        self.client.login(**self.user_data)
+        cursor = self.client.get(self.vault_sync_url).data['cursor']
+
+        # A write whose clock lags behind, or that took its timestamp long before committing
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        with mock.patch('django.utils.timezone.now', return_value=an_hour_ago):
+            self.client.patch(reverse('vault_item-detail', kwargs={'uuid': self.vault_item1.uuid}),
+                              {'encrypted_data': 'updated encrypted data'})
+        response = self.client.get(self.vault_sync_url, {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['vault_items']), [str(self.vault_item1.uuid)])
+        self.assertGreater(response.data['cursor'], cursor)
+
+    def test_vault_sync_expired_cursor(self):
+        get_user_model().objects.filter(pk=self.user.id).update(pruned_vault_version=5)
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_sync_url, {'since': 4})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Sync cursor expired, sync again without one.', response.data['since'])
+        response = self.client.get(self.vault_sync_url, {'since': 5})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(VAULT_TOMBSTONE_RETENTION_DAYS=30)
+    def test_prune_tombstones(self):
+        for vault_version, uuid in enumerate((self.vault_item1.uuid, self.vault_item2.uuid), 1):
+            VaultTombstone.objects.create(user=self.user, kind=VaultTombstone.VAULT_ITEM, uuid=uuid,
+                                          vault_version=vault_version)
+        VaultTombstone.objects.filter(uuid=self.vault_item1.uuid).update(
+            deleted_at=timezone.now() - timedelta(days=31))
+
+        out = StringIO()
+        call_command('prune_tombstones', batch_size=1, stdout=out)
+        self.assertIn('Pruned 1 tombstones.', out.getvalue())
+        self.assertEqual(list(VaultTombstone.objects.values_list('uuid', flat=True)),
+                         [self.vault_item2.uuid])
+        self.assertEqual(get_user_model().objects.get(pk=self.user.id).pruned_vault_version, 1)
+
+    def login_admin(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='super-password')
+        self.client.force_login(admin)
+
+    def get_tombstones(self, user):
+        return set(VaultTombstone.objects.filter(user=user).values_list('kind', 'uuid'))
+
+    def test_vault_sync_admin_delete_vault_item(self):
+        self.login_admin()
+        response = self.client.post(
+            reverse('admin:api_vaultitem_delete', args=[self.vault_item1.id]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_tombstones(self.user),
+                         {(VaultTombstone.VAULT_ITEM, self.vault_item1.uuid)})
+
+    def test_vault_sync_admin_delete_selected_vault_collections(self):
+        self.login_admin()
+        response = self.client.post(reverse('admin:api_vaultcollection_changelist'), {
+            'action': 'delete_selected', '_selected_action': [self.vault_collection.id],
+            'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_tombstones(self.user), {
+            (VaultTombstone.VAULT_COLLECTION, self.vault_collection.uuid),
+            (VaultTombstone.VAULT_ITEM, self.vault_item1.uuid),
+            (VaultTombstone.VAULT_ITEM, self.vault_item2.uuid)})
+
+    def test_vault_sync_admin_inline_delete(self):
+        self.login_admin()
+        response = self.client.post(
+            reverse('admin:api_vaultcollection_change', args=[self.vault_collection.id]), {
+                'name': 'folder1', 'user': self.user.id,
+                'vault_items-TOTAL_FORMS': 2, 'vault_items-INITIAL_FORMS': 2,
+                'vault_items-0-id': self.vault_item1.id,
+                'vault_items-0-vault_collection': self.vault_collection.id,
+                'vault_items-0-encrypted_data': 'encrypted data 1',
+                'vault_items-0-DELETE': 'on',
+                'vault_items-1-id': self.vault_item2.id,
+                'vault_items-1-vault_collection': self.vault_collection.id,
+                'vault_items-1-encrypted_data': 'encrypted data 2'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_tombstones(self.user),
+                         {(VaultTombstone.VAULT_ITEM, self.vault_item1.uuid)})
+
+    def test_vault_sync_admin_move_vault_collection(self):
+        self.client.login(**self.user_data)
+        cursor = self.client.get(self.vault_sync_url).data['cursor']
+        self.client.login(**self.other_user_data)
+        other_cursor = self.client.get(self.vault_sync_url).data['cursor']
+
+        self.login_admin()
+        response = self.client.post(
+            reverse('admin:api_vaultcollection_change', args=[self.vault_collection.id]),
+            {'name': 'folder1', 'user': self.other_user.id,
+             'vault_items-TOTAL_FORMS': 0, 'vault_items-INITIAL_FORMS': 0})
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(**self.user_data)
+        response = self.client.get(self.vault_sync_url, {'since': cursor})
+        self.assertEqual(response.data['deleted_vault_collections'], [self.vault_collection.uuid])
+        self.assertCountEqual(response.data['deleted_vault_items'],
+                              [self.vault_item1.uuid, self.vault_item2.uuid])
+        self.client.login(**self.other_user_data)
+        response = self.client.get(self.vault_sync_url, {'since': other_cursor})
+        self.assertEqual(list(response.data['vault_collections']),
+                         [str(self.vault_collection.uuid)])
+        self.assertCountEqual(response.data['vault_items'],
+                              [str(self.vault_item1.uuid), str(self.vault_item2.uuid)])
+
+    def test_vault_sync_user_not_authenticated(self):
+        response = self.client.get(self.vault_sync_url)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn(
+            'Authentication credentials were not provided.', response.data['detail'])
+
+    @override_settings(DATABASE_REPLICAS=['replica_0'])
+    def test_vault_sync_reads_from_primary(self):
+        self.client.login(**self.user_data)
+        routed = []
+
+        # Records what would be read from the replica, reading it from the test database instead
+        def db_for_read(router, model, **hints):
+            routed.append(model)
+            return 'default'
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read):
+            response = self.client.get(self.vault_sync_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['vault_items']), 2)
+        for model in (VaultItem, VaultCollection, VaultTombstone):
+            self.assertNotIn(model, routed)
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from api.models import VaultCollection, VaultItem
+
+
+class TestVaultVersionAPIView(APITestCase):
+
+    def setUp(self):
+        self.vault_version_url = reverse('vault_version')
+        self.vault_items_url = reverse('vault_item-list')
+        self.vault_collections_url = reverse('vault_collection-list')
+
+        self.user_data = {
+            'email': 'pippa1@gmail.com',
+            'password': 'super-password'
+        }
+        self.user = get_user_model().objects.create_user(**self.user_data)
+        self.vault_collection = VaultCollection.objects.create(
+            name='folder1', user_id=self.user.id)
+        self.vault_item = VaultItem.objects.create(
+            encrypted_data='encrypted data', vault_collection_id=self.vault_collection.id)
+
+        self.other_user = get_user_model().objects.create_user(
+            email='pippa2@gmail.com', password='super-password')
+
+        self.client.login(**self.user_data)
+
+    def get_vault_version(self):
+        response = self.client.get(self.vault_version_url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['vault_version']
+
+    def assertVaultVersionBumped(self, change):
+        version = self.get_vault_version()
+        response = change()
+        self.assertLess(response.status_code, 300)
+        self.assertEqual(self.get_vault_version(), version + 1)
+
+    def test_vault_version_default_collection_created(self):
+        # The default collection is created together with the user, so there is nothing to bump
+        self.assertEqual(get_user_model().objects.get(id=self.other_user.id).vault_version, 0)
+
+    def test_vault_version_get_query_count(self):
+        # session and user only
+        with self.assertNumQueries(2):
+            self.client.get(self.vault_version_url)
+
+    def test_vault_version_vault_item_create(self):
+        self.assertVaultVersionBumped(lambda: self.client.post(self.vault_items_url, {
+            'encrypted_data': 'encrypted data 2',
+            'vault_collection': self.vault_collection.uuid
+        }))
+
+    def test_vault_version_vault_item_update(self):
+        self.assertVaultVersionBumped(lambda: self.client.patch(
+            reverse('vault_item-detail', kwargs={'uuid': self.vault_item.uuid}),
+            {'encrypted_data': 'updated encrypted data'}))
+
+    def test_vault_version_vault_item_delete(self):
+        self.assertVaultVersionBumped(lambda: self.client.delete(
+            reverse('vault_item-detail', kwargs={'uuid': self.vault_item.uuid})))
+
+    def test_vault_version_vault_item_bulk(self):
+        self.assertVaultVersionBumped(lambda: self.client.post(reverse('vault_item-bulk'), {
+            'operations': [{'op': 'delete', 'uuid': str(self.vault_item.uuid)}]
+        }, format='json'))
+
+    def test_vault_version_vault_collection_create(self):
+        self.assertVaultVersionBumped(lambda: self.client.post(
+            self.vault_collections_url, {'name': 'Work'}))
+
+    def test_vault_version_vault_collection_update(self):
+        self.assertVaultVersionBumped(lambda: self.client.put(
+            reverse('vault_collection-detail', kwargs={'uuid': self.vault_collection.uuid}),
+            {'name': 'renamed folder'}))
+
+    def test_vault_version_vault_collection_delete(self):
+        self.assertVaultVersionBumped(lambda: self.client.delete(
+            reverse('vault_collection-detail', kwargs={'uuid': self.vault_collection.uuid})))
+
+    def test_vault_version_failed_write_not_bumped(self):
+        version = self.get_vault_version()
+        self.client.post(self.vault_items_url, {'vault_collection': self.vault_collection.uuid})
+        self.assertEqual(self.get_vault_version(), version)
+
+    def test_vault_version_other_user_unaffected(self):
+        version = get_user_model().objects.get(id=self.other_user.id).vault_version
+        self.client.post(self.vault_collections_url, {'name': 'Work'})
+        self.assertEqual(get_user_model().objects.get(id=self.other_user.id).vault_version,
+                         version)
+
+    def test_vault_version_admin_edit(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='super-password')
+        self.client.force_login(admin)
+        version = get_user_model().objects.get(id=self.user.id).vault_version
+        response = self.client.post(
+            reverse('admin:api_vaultitem_change', args=[self.vault_item.id]),
+            {'encrypted_data': 'edited by admin', 'vault_collection': self.vault_collection.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(get_user_model().objects.get(id=self.user.id).vault_version,
+                         version + 1)
+
+    def get_user_vault_version(self, user):
+        return get_user_model().objects.get(id=user.id).vault_version
+
+    def test_vault_version_admin_move_collection(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='super-password')
+        self.client.force_login(admin)
+        versions = self.get_user_vault_version(self.user), self.get_user_vault_version(self.other_user)
+        response = self.client.post(
+            reverse('admin:api_vaultcollection_change', args=[self.vault_collection.id]),
+            {'name': 'folder1', 'user': self.other_user.id,
+             'vault_items-TOTAL_FORMS': 0, 'vault_items-INITIAL_FORMS': 0})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_user_vault_version(self.user), versions[0] + 1)
+        self.assertEqual(self.get_user_vault_version(self.other_user), versions[1] + 1)
+
+    def test_vault_version_admin_delete_selected(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='super-password')
+        self.client.force_login(admin)
+        version = self.get_user_vault_version(self.user)
+        response = self.client.post(reverse('admin:api_vaultitem_changelist'), {
+            'action': 'delete_selected', '_selected_action': [self.vault_item.id], 'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(VaultItem.objects.exists())
+        self.assertEqual(self.get_user_vault_version(self.user), version + 1)
+
+    def test_vault_version_user_not_authenticated(self):
+        self.client.logout()
+        response = self.client.get(self.vault_version_url)
+        self.assertEqual(response.status_code, 403)
@@ -1,8 +1,169 @@
-from rest_framework.throttling import AnonRateThrottle
+from collections.abc import Mapping
+from hashlib import sha256
 
+from django.conf import settings
+from django.core.cache import caches
 
-class SignupAnonRateThrottle(AnonRateThrottle):
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
 
-    def __init__(self):
-        self.rate = '5/day'
-        super().__init__()
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    # Sliding window counter. Each client has one counter per fixed window of the rate's duration,
+    # and the request rate is estimated as the current window's count plus the previous window's
+    # count weighted by how much of the previous window still overlaps the sliding one. Unlike
+    # SimpleRateThrottle's list of timestamps, that is two integers per client however high the
+    # rate, and the counter is incremented atomically in THROTTLE_CACHE_ALIAS, which should be
+    # shared by all workers so the limits hold across them.
+    # With count_throttled, throttled attempts are counted too, so a client that keeps retrying
+    # stays throttled. Otherwise they are taken back out, and only allowed attempts use up the rate.
+    count_throttled = True
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    # Read on each use rather than once at import as in SimpleRateThrottle
+    @property
+    def THROTTLE_RATES(self):
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, self.elapsed = divmod(self.now / self.duration, 1)
+        current_key = f'{self.key}_{window:.0f}'
+        previous_key = f'{self.key}_{window - 1:.0f}'
+
+        self.previous = self.cache.get(previous_key, 0)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # Long enough for the window to serve as the previous one of the next window
+            self.cache.add(current_key, 0, self.duration * 2)
+            self.current = self.cache.incr(current_key)
+
+        if self.previous * (1 - self.elapsed) + self.current > self.num_requests:
+            if not self.count_throttled:
+                try:
+                    self.current = self.cache.decr(current_key)
+                except ValueError:
+                    # Expired since the incr()
+                    pass
+            return self.throttle_failure()
+        return True
+
+    # Seconds until the estimate leaves room for one more request
+    def wait(self):
+        if self.current < self.num_requests:
+            # Once enough of the previous window has slid out of this one
+            elapsed = 1 - (self.num_requests - self.current - 1) / self.previous
+        else:
+            # Once enough of this window has slid out of the next one
+            elapsed = 2 - (self.num_requests - 1) / self.current
+        return max(elapsed - self.elapsed, 0) * self.duration
+
+
+# Limits each client IP address, as seen through NUM_PROXIES proxies
+class IPRateThrottle(SlidingWindowRateThrottle):
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+# Identifies the email address a login or signup is for, or returns None if there is none,
+# including when the body is not an object, which validation then rejects.
+# Hashed to keep addresses out of the cache and keys within memcached's limits.
+def get_email_ident(request):
+    if not isinstance(request.data, Mapping):
+        return None
+    email = request.data.get('email')
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return sha256(email.strip().lower().encode()).hexdigest()
+
+
+# Limits attempts at each email address from all clients together. Requests without an email
+# are left to the IP throttle and to validation.
+# Anyone may send attempts for someone else's email, so throttled ones are not counted: they
+# cannot keep the owner locked out for longer than the attempts that got through.
+class EmailRateThrottle(SlidingWindowRateThrottle):
+    count_throttled = False
+
+    def get_cache_key(self, request, view):
+        ident = get_email_ident(request)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginIPRateThrottle(IPRateThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailRateThrottle(EmailRateThrottle):
+    scope = 'login_email'
+
+
+class SignupIPRateThrottle(IPRateThrottle):
+    scope = 'signup_ip'
+
+
+class SignupEmailRateThrottle(EmailRateThrottle):
+    scope = 'signup_email'
+
+
+class LoginFailureThrottle(BaseThrottle):
+    # Rejects logins for an email address with LOGIN_FAILURE_EMAIL_LIMIT failed logins, or from an
+    # IP address with LOGIN_FAILURE_IP_LIMIT, within LOGIN_FAILURE_TIMEOUT seconds of the first
+    # one. The check is a single cache read made before the user is looked up or any password is
+    # hashed, so rejected attempts are cheap. It takes the same time and gives the same answer
+    # whether or not the email has an account, and unknown emails count failures like wrong
+    # passwords do, so the lockout tells nothing about which emails exist.
+    # LoginAPIView records the outcome of each login that gets through.
+
+    cache_format = 'login_failures_%(scope)s_%(ident)s'
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def get_limits(self, request):
+        limits = {self.cache_format % {'scope': 'ip', 'ident': self.get_ident(request)}:
+                  settings.LOGIN_FAILURE_IP_LIMIT}
+        email_ident = get_email_ident(request)
+        if email_ident is not None:
+            limits[self.cache_format % {'scope': 'email', 'ident': email_ident}] = \
+                settings.LOGIN_FAILURE_EMAIL_LIMIT
+        return limits
+
+    def allow_request(self, request, view):
+        limits = self.get_limits(request)
+        failures = self.cache.get_many(limits)
+        return all(failures.get(key, 0) < limit for key, limit in limits.items())
+
+    # The counters are not timestamped, so this is the longest the client may have to wait
+    def wait(self):
+        return settings.LOGIN_FAILURE_TIMEOUT
+
+    def record_failure(self, request):
+        for key in self.get_limits(request):
+            # The counter expires LOGIN_FAILURE_TIMEOUT seconds after the first failure
+            self.cache.add(key, 0, settings.LOGIN_FAILURE_TIMEOUT)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # Expired between add() and incr()
+                self.cache.add(key, 1, settings.LOGIN_FAILURE_TIMEOUT)
+
+    # A successful login clears the email's failures, but not those of the IP address
+    def record_success(self, request):
+        email_ident = get_email_ident(request)
+        if email_ident is not None:
+            self.cache.delete(self.cache_format % {'scope': 'email', 'ident': email_ident})
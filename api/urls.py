@@ -1,16 +1,31 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import LoginAPIView, LogoutAPIView, SignupAPIView, UserKeyAPIView, \
-    VaultCollectionViewSet, VaultItemViewSet
+    VaultCollectionViewSet, VaultItemViewSet, VaultSyncAPIView, VaultVersionAPIView
 
 router = DefaultRouter()
 
-urlpatterns = [
+# Resolve before the DRF routes of the same URLs when ASYNC_READ_VIEWS is on
+async_read_urlpatterns = [
+    path('user_key/', async_views.user_key, name='user_key'),
+    path('vault_items/', async_views.vault_item_list, name='vault_item-list'),
+    re_path(r'^vault_items/(?P<uuid>[^/.]+)/$', async_views.vault_item_detail,
+            name='vault_item-detail'),
+    path('vault_collections/', async_views.vault_collection_list,
+         name='vault_collection-list'),
+]
+
+urlpatterns = list(async_read_urlpatterns) if settings.ASYNC_READ_VIEWS else []
+urlpatterns += [
     path('login/', LoginAPIView.as_view(), name='login'),
     path('logout/', LogoutAPIView.as_view(), name='logout'),
     path('signup/', SignupAPIView.as_view(), name='signup'),
     path('user_key/', UserKeyAPIView.as_view(), name='user_key'),
+    path('vault_sync/', VaultSyncAPIView.as_view(), name='vault_sync'),
+    path('vault_version/', VaultVersionAPIView.as_view(), name='vault_version'),
 ]
 
 router.register(r'vault_items', VaultItemViewSet, basename='vault_item')
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+
+from .models import UserKey
+
+
+# Whether every worker sees the same entries in the cache with this alias
+def is_shared_cache(alias):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+class UserKeyCache:
+    # UserKey fields, looked up first in a per-process LRU, then in the shared cache and
+    # only then in the database. Saving or deleting a UserKey drops it from this process's LRU
+    # and bumps its version in the shared cache. Other processes keep serving their LRU copy for
+    # at most `local_timeout` seconds, so keep that short.
+    # Shared entries are stored with the version they were read under and ignored once it has
+    # moved on, so a request that read the old row before an invalidation cannot put it back
+    # after it.
+
+    def __init__(self, max_entries, timeout, local_timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def cache_key(self, user_id):
+        return f'user_key:{user_id}'
+
+    def version_key(self, user_id):
+        return f'user_key_version:{user_id}'
+
+    def get_local(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._entries.move_to_end(user_id)
+            self.local_hits += 1
+            return entry[1]
+
+    def set_local(self, user_id, fields):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.local_timeout, fields)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Returns the user's UserKey, or None if the user has none. The instance is rebuilt from the
+    # cached fields and is only meant to be read or serialized.
+    def get(self, user_id):
+        fields = self.get_local(user_id)
+        if fields is None:
+            fields = self.load(user_id)
+        return None if fields is None else UserKey(user_id=user_id, **fields)
+
+    async def aget(self, user_id):
+        fields = self.get_local(user_id)
+        if fields is None:
+            fields = await sync_to_async(self.load)(user_id)
+        return None if fields is None else UserKey(user_id=user_id, **fields)
+
+    def load(self, user_id):
+        cached = cache.get_many([self.cache_key(user_id), self.version_key(user_id)])
+        version = cached.get(self.version_key(user_id), 0)
+        entry = cached.get(self.cache_key(user_id))
+        fields = entry[1] if entry is not None and entry[0] == version else None
+        with self._lock:
+            if fields is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+        if fields is None:
+            # Read from the primary, a lagging replica would fill the cache with an old key
+            fields = UserKey.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values(
+                'id', 'encrypted_symmetric_key', 'created_at', 'modified_at').first()
+            if fields is None:
+                return None
+            cache.set(self.cache_key(user_id), (version, fields), self.timeout)
+        self.set_local(user_id, fields)
+        return fields
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        # Kept without expiry, an entry must never see its version go back
+        if not cache.add(self.version_key(user_id), 1, None):
+            try:
+                cache.incr(self.version_key(user_id))
+            except ValueError:
+                # Evicted between add() and incr()
+                cache.add(self.version_key(user_id), 1, None)
+        cache.delete(self.cache_key(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.local_hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.local_hits + self.shared_hits) / lookups if lookups else 0,
+        }
+
+
+_user_key_cache = None
+_user_key_cache_lock = threading.Lock()
+
+
+def get_user_key_cache():
+    global _user_key_cache
+    if _user_key_cache is None:
+        with _user_key_cache_lock:
+            if _user_key_cache is None:
+                # A per-process cache only clears the worker that made the change, so the
+                # others must not keep the key for longer than the LRU would
+                timeout = settings.USER_KEY_CACHE_TIMEOUT
+                if not is_shared_cache(DEFAULT_CACHE_ALIAS):
+                    timeout = min(timeout, settings.USER_KEY_CACHE_LOCAL_TIMEOUT)
+                _user_key_cache = UserKeyCache(settings.USER_KEY_CACHE_MAX_ENTRIES, timeout,
+                                               settings.USER_KEY_CACHE_LOCAL_TIMEOUT)
+    return _user_key_cache
+
+
+@receiver(setting_changed)
+def reset_user_key_cache(setting, **kwargs):
+    global _user_key_cache
+    if setting.startswith('USER_KEY_CACHE_') or setting == 'CACHES':
+        with _user_key_cache_lock:
+            _user_key_cache = None
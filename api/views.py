@@ -1,29 +1,63 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model, login, logout
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Prefetch
+from django.http import StreamingHttpResponse
 
 from rest_framework import status
-from rest_framework.exceptions import NotFound, PermissionDenied
-from rest_framework.generics import CreateAPIView
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied, ValidationError
+from rest_framework.generics import CreateAPIView, get_object_or_404
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from .etags import conditional_vault_list
+from .pagination import VaultCollectionPagination, VaultItemPagination
+from .renderers import ORJSONRenderer
 from .serializers import LoginSerializer, SignupSerializer, UserKeySerializer, \
-    VaultCollectionSerializer, VaultItemSerializer
-from .throttling import SignupAnonRateThrottle
+    VaultCollectionSerializer, VaultItemBulkSerializer, VaultItemReadSerializer, VaultItemSerializer
+from .throttling import LoginEmailRateThrottle, LoginFailureThrottle, LoginIPRateThrottle, \
+    SignupEmailRateThrottle, SignupIPRateThrottle
+from .user_key_cache import get_user_key_cache
+
+from api.models import VaultItem, VaultCollection, VaultTombstone
+from config.metrics import measure_serialization
 
-from api.models import UserKey, VaultItem, VaultCollection
+
+# Under ASGI, Django reads a sync streaming iterator to the end with sync_to_async(list) before
+# sending any of it. This hands the chunks over as an async iterator instead, advancing the sync
+# one a batch at a time in the request's thread, so only one batch is held in memory.
+async def iterate_in_batches(chunks, batch_size):
+    next_batch = sync_to_async(lambda: list(islice(chunks, batch_size)))
+    try:
+        while batch := await next_batch():
+            for chunk in batch:
+                yield chunk
+    finally:
+        # Closes the server-side cursor on the connection that opened it
+        await sync_to_async(chunks.close)()
 
 
 class LoginAPIView(APIView):
+    # Checked before the password is hashed, so each attempt over the limits is cheap
+    throttle_classes = [LoginIPRateThrottle, LoginEmailRateThrottle, LoginFailureThrottle]
     authentication_classes = []
     permission_classes = [AllowAny]
 
     def post(self, request):
 
         serializer = LoginSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except AuthenticationFailed:
+            LoginFailureThrottle().record_failure(request)
+            raise
+        LoginFailureThrottle().record_success(request)
 
         user = serializer.validated_data['user']
         login(request, user)
@@ -41,7 +75,7 @@ class LogoutAPIView(APIView):
 
 
 class SignupAPIView(CreateAPIView):
-    throttle_classes = [SignupAnonRateThrottle]
+    throttle_classes = [SignupIPRateThrottle, SignupEmailRateThrottle]
     authentication_classes = []
     permission_classes = [AllowAny]
 
@@ -52,13 +86,11 @@ class SignupAPIView(CreateAPIView):
 class UserKeyAPIView(APIView):
 
     def get(self, request):
-        try:
-            user_key = UserKey.objects.get(user=request.user.id)
-        except ObjectDoesNotExist:
+        user_key = get_user_key_cache().get(request.user.id)
+        if user_key is None:
             raise PermissionDenied("User's symmetric key not found")
 
         serializer = UserKeySerializer(user_key)
-
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
 
@@ -67,37 +99,97 @@ class VaultItemViewSet(ModelViewSet):
     # to be called for every API request
     serializer_class = VaultItemSerializer
     # Overridden by get_queryset() but still required
-    queryset = VaultItem.objects.all()
+    # Joins the VaultCollection so serializing vault_collection and vault_collection_name
+    # does not cost an extra query per item
+    queryset = VaultItem.objects.select_related('vault_collection').all()
     lookup_field = 'uuid'  # VaultItems are looked up by uuid rather than pk
+    pagination_class = VaultItemPagination  # Only used when the client asks for a page
+    export_chunk_size = 500  # Rows fetched per round trip from the server-side cursor
     # Overrides the ViewSet queryset attribute to ensure users can only access their own VaultItems
     # Results in a 404 if a user tries to list, retrieve, put, or delete a VaultItem they don't own
 
     def get_queryset(self):
         queryset = super(VaultItemViewSet, self).get_queryset()
-        return queryset.filter(vault_collection__user_id=self.request.user.id)
+        return queryset.filter(user_id=self.request.user.id)
 
-    def validate_vault_collection(self, serializer):
-        try:
-            if 'vault_collection' in serializer.validated_data:
-                VaultCollection.objects.get(user_id=self.request.user.id,
-                                            uuid=serializer.validated_data['vault_collection'].uuid)
-        except ObjectDoesNotExist:
-            raise NotFound(
-                detail='User does not own VaultCollection')
+    # Rows for VaultItemReadSerializer, which list, retrieve and export use
+    def get_read_queryset(self):
+        return self.filter_queryset(self.get_queryset()).values(*VaultItemReadSerializer.values)
 
+    # The serializer's vault_collection field already checked the user owns the collection
     def perform_create(self, serializer):
-        self.validate_vault_collection(serializer)
-        super().perform_create(serializer)
+        with transaction.atomic():
+            serializer.save(
+                vault_version=get_user_model().objects.next_vault_version(self.request.user.id))
 
     def perform_update(self, serializer):
-        self.validate_vault_collection(serializer)
-        super().perform_create(serializer)
-
-    # Formats the output of list GET requests as a dict instead of a list
+        with transaction.atomic():
+            serializer.save(
+                vault_version=get_user_model().objects.next_vault_version(self.request.user.id))
+
+    # Leaves a tombstone behind so sync clients learn about the deletion
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            VaultTombstone.objects.record(
+                instance, instance.user_id,
+                get_user_model().objects.next_vault_version(instance.user_id))
+            instance.delete()
+
+    # Formats the output of list GET requests as a dict instead of a list.
+    # Paginated requests get the same dict shape for each page.
+    @conditional_vault_list
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({item['uuid']: item for item in serializer.data})
+        queryset = self.get_read_queryset()
+        serializer = VaultItemReadSerializer()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            with measure_serialization():
+                data = {item['uuid']: item for item in map(serializer.to_representation, page)}
+            return self.get_paginated_response(data)
+
+        with measure_serialization():
+            data = {item['uuid']: item for item in map(serializer.to_representation, queryset)}
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        vault_item = get_object_or_404(self.get_read_queryset(),
+                                       **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        with measure_serialization():
+            data = VaultItemReadSerializer().to_representation(vault_item)
+        return Response(data)
+
+    # Streams the whole vault in the same {uuid: item} shape as list. Rows are read from a
+    # server-side cursor and encoded one at a time, so memory use does not grow with the vault.
+    # Under ASGI the stream is async, see iterate_in_batches.
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = self.get_read_queryset().order_by('id')
+        serializer = VaultItemReadSerializer()
+        renderer = ORJSONRenderer()
+
+        def stream():
+            separator = b'{'
+            for vault_item in queryset.iterator(chunk_size=self.export_chunk_size):
+                item = serializer.to_representation(vault_item)
+                yield separator + renderer.render(item['uuid']) + b':' + renderer.render(item)
+                separator = b','
+            yield b'}' if separator == b',' else b'{}'
+
+        chunks = stream()
+        if isinstance(request._request, ASGIRequest):
+            chunks = iterate_in_batches(chunks, self.export_chunk_size)
+        return StreamingHttpResponse(chunks, content_type=renderer.media_type)
+
+    # Applies a batch of create, update and delete operations in a single transaction.
+    # Either every operation is applied or, if any is invalid, none are and the errors
+    # are returned per operation.
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = VaultItemBulkSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        return Response(data={'results': results}, status=status.HTTP_200_OK)
 
 
 class VaultCollectionViewSet(ModelViewSet):
@@ -105,15 +197,129 @@ class VaultCollectionViewSet(ModelViewSet):
     # to be called for every API request
     serializer_class = VaultCollectionSerializer
     # Overridden by get_queryset() but still required
-    queryset = VaultCollection.objects.prefetch_related('vault_items').all()
+    queryset = VaultCollection.objects.all()
     lookup_field = 'uuid'  # VaultCollections are looked up by uuid rather than pk
+    pagination_class = VaultCollectionPagination  # Only used when the client asks for a page
+    include_options = ['items', 'item_count']  # Expansions clients can ask for with ?include=
 
     # Overrides the ViewSet queryset attribute to ensure users can only access their own VaultItems
     # Results in a 404 if a user tries to list, retrieve, put, or delete a VaultItem they don't own
+    # The items, or their count, are only loaded when the client asked for them
 
     def get_queryset(self):
         queryset = super(VaultCollectionViewSet, self).get_queryset()
+        include = self.get_include()
+        if 'items' in include:
+            # Each prefetched item has its collection set, so serializing it costs no query
+            queryset = queryset.prefetch_related(
+                Prefetch('vault_items', queryset=VaultItem.objects.order_by('id')))
+        if 'item_count' in include:
+            queryset = queryset.annotate(item_count=Count('vault_items'))
         return queryset.filter(user_id=self.request.user.id)
 
+    # Comma-separated expansions from ?include=, only honoured on reads
+    def get_include(self):
+        if self.request.method != 'GET':
+            return set()
+        include = set(filter(None, self.request.query_params.get('include', '').split(',')))
+        unknown = include.difference(self.include_options)
+        if unknown:
+            raise ValidationError({'include': [f'"{name}" is not a valid choice.'
+                                               for name in sorted(unknown)]})
+        return include
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include'] = self.get_include()
+        return context
+
+    @conditional_vault_list
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(context={'request': self.request})
+        with transaction.atomic():
+            serializer.save(
+                vault_version=get_user_model().objects.next_vault_version(self.request.user.id))
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save(
+                vault_version=get_user_model().objects.next_vault_version(self.request.user.id))
+
+    # Leaves tombstones for the collection and the VaultItems deleted along with it
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            vault_version = get_user_model().objects.next_vault_version(instance.user_id)
+            # Items added to the collection lock its row, so once it is locked no other
+            # transaction can add one that would be deleted without a tombstone
+            VaultCollection.objects.select_for_update().filter(pk=instance.pk).first()
+            VaultTombstone.objects.record(instance, instance.user_id, vault_version)
+            instance.delete()
+
+
+class VaultVersionAPIView(APIView):
+
+    # The version is loaded with the authenticated user, so this costs no query of its own
+    def get(self, request):
+        return Response(data={'vault_version': request.user.vault_version},
+                        status=status.HTTP_200_OK)
+
+
+class VaultSyncAPIView(APIView):
+
+    def get_since(self, request):
+        since = request.query_params.get('since')
+        if not since:
+            return None
+
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ValidationError({'since': ['Invalid sync cursor.']})
+        return since
+
+    # Returns everything created, modified or deleted since the cursor plus a new cursor.
+    # Without a cursor the whole vault is returned.
+    # The cursor is the user's vault_version, read before the rows. Every write stamped with it
+    # or a lower version had committed by then, see UserManager.next_vault_version, and later
+    # ones are sent again after it. Read from the primary, where that holds.
+    def get(self, request):
+        since = self.get_since(request)
+        cursor, pruned_vault_version = get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(
+            pk=request.user.id).values_list('vault_version', 'pruned_vault_version').get()
+        # Tombstones of deletions after the cursor may have been pruned
+        if since is not None and since < pruned_vault_version:
+            raise ValidationError({'since': ['Sync cursor expired, sync again without one.']})
+
+        vault_items = VaultItem.objects.using(DEFAULT_DB_ALIAS).filter(user_id=request.user.id)
+        vault_collections = VaultCollection.objects.using(DEFAULT_DB_ALIAS).filter(
+            user_id=request.user.id)
+        tombstones = VaultTombstone.objects.using(DEFAULT_DB_ALIAS).filter(user_id=request.user.id)
+        if since is None:
+            tombstones = tombstones.none()
+        else:
+            vault_items = vault_items.filter(vault_version__gt=since)
+            vault_collections = vault_collections.filter(vault_version__gt=since)
+            tombstones = tombstones.filter(vault_version__gt=since)
+
+        deleted = {VaultTombstone.VAULT_ITEM: [], VaultTombstone.VAULT_COLLECTION: []}
+        for kind, uuid in tombstones.values_list('kind', 'uuid'):
+            deleted[kind].append(uuid)
+
+        serializer = VaultItemReadSerializer()
+        with measure_serialization():
+            vault_item_data = [serializer.to_representation(vault_item) for vault_item
+                               in vault_items.values(*VaultItemReadSerializer.values)]
+        vault_collection_data = VaultCollectionSerializer(vault_collections, many=True).data
+
+        return Response(data={
+            'cursor': cursor,
+            'vault_items': {item['uuid']: item for item in vault_item_data},
+            'vault_collections': {collection['uuid']: collection
+                                  for collection in vault_collection_data},
+            'deleted_vault_items': deleted[VaultTombstone.VAULT_ITEM],
+            'deleted_vault_collections': deleted[VaultTombstone.VAULT_COLLECTION],
+        }, status=status.HTTP_200_OK)
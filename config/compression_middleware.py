@@ -0,0 +1,200 @@
+import threading
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Each returns the compress(chunk) and finish() functions of a new compressor at the given level
+def gzip_compressor(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 selects the gzip container
+    return compressor.compress, compressor.flush
+
+
+def brotli_compressor(level):
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.finish
+
+
+def zstd_compressor(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, compressor.flush
+
+
+COMPRESSORS = {'gzip': gzip_compressor}
+if brotli is not None:
+    COMPRESSORS['br'] = brotli_compressor
+if zstandard is not None:
+    COMPRESSORS['zstd'] = zstd_compressor
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record(encoding, raw_bytes, compressed_bytes, cpu_seconds, responses):
+    with _stats_lock:
+        stats = _stats.setdefault(encoding, {
+            'responses': 0, 'raw_bytes': 0, 'compressed_bytes': 0, 'cpu_seconds': 0.0})
+        stats['responses'] += responses
+        stats['raw_bytes'] += raw_bytes
+        stats['compressed_bytes'] += compressed_bytes
+        stats['cpu_seconds'] += cpu_seconds
+
+
+# Per encoding totals for this process. Streamed responses are counted once they have been sent.
+def get_compression_stats():
+    with _stats_lock:
+        return {encoding: {
+            **stats,
+            'ratio': stats['compressed_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 0,
+        } for encoding, stats in _stats.items()}
+
+
+def reset_compression_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# Returns the first of COMPRESSION_ENCODINGS with the highest quality in the Accept-Encoding
+# header, or None if the client accepts none of them
+def choose_encoding(accept_encoding):
+    qualities = {}
+    for coding in accept_encoding.lower().split(','):
+        name, _, params = coding.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in settings.COMPRESSION_ENCODINGS:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if encoding in COMPRESSORS and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+# Compresses JSON responses with zstd, brotli or gzip, whichever of COMPRESSION_ENCODINGS the
+# client prefers. Other content types and responses under COMPRESSION_MIN_SIZE bytes are left
+# alone. Streamed responses are compressed as they are sent, without buffering them whole.
+# Must come before any middleware that reads or changes the response body.
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        media_type = response.get('Content-Type', '').partition(';')[0].strip()
+        if media_type != 'application/json' and not media_type.endswith('+json'):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        level = settings.COMPRESSION_LEVELS[encoding]
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async_stream(
+                    encoding, level, response.streaming_content)
+            else:
+                response.streaming_content = self.compress_stream(
+                    encoding, level, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            start = time.thread_time()
+            compress, finish = COMPRESSORS[encoding](level)
+            compressed = compress(response.content) + finish()
+            cpu_seconds = time.thread_time() - start
+            # Incompressible bodies are sent as they are, and counted as sent
+            if len(compressed) >= len(response.content):
+                record(encoding, len(response.content), len(response.content), cpu_seconds,
+                       responses=1)
+                return response
+            record(encoding, len(response.content), len(compressed), cpu_seconds, responses=1)
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is no longer byte for byte what the strong ETag was given for.
+        # Weak ETags still match If-None-Match, so conditional requests keep getting 304s.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress_stream(self, encoding, level, chunks):
+        compress, finish = COMPRESSORS[encoding](level)
+        raw_bytes = compressed_bytes = cpu_seconds = 0
+        try:
+            for chunk in chunks:
+                start = time.thread_time()
+                compressed = compress(chunk)
+                cpu_seconds += time.thread_time() - start
+                raw_bytes += len(chunk)
+                compressed_bytes += len(compressed)
+                # Compressors buffer small chunks, so most of them produce no output yet
+                if compressed:
+                    yield compressed
+            start = time.thread_time()
+            compressed = finish()
+            cpu_seconds += time.thread_time() - start
+            compressed_bytes += len(compressed)
+            yield compressed
+        finally:
+            record(encoding, raw_bytes, compressed_bytes, cpu_seconds, responses=1)
+
+    async def compress_async_stream(self, encoding, level, chunks):
+        compress, finish = COMPRESSORS[encoding](level)
+        raw_bytes = compressed_bytes = cpu_seconds = 0
+        try:
+            async for chunk in chunks:
+                start = time.thread_time()
+                compressed = compress(chunk)
+                cpu_seconds += time.thread_time() - start
+                raw_bytes += len(chunk)
+                compressed_bytes += len(compressed)
+                if compressed:
+                    yield compressed
+            start = time.thread_time()
+            compressed = finish()
+            cpu_seconds += time.thread_time() - start
+            compressed_bytes += len(compressed)
+            yield compressed
+        finally:
+            record(encoding, raw_bytes, compressed_bytes, cpu_seconds, responses=1)
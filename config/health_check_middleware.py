@@ -1,12 +1,45 @@
-from django.http import HttpResponse
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http import HttpResponse, JsonResponse
 
+from .readiness import get_readiness
 
+
+def readiness_response():
+    ready, checks = get_readiness().get()
+    return JsonResponse({'status': 'ok' if ready else 'unavailable', 'checks': checks},
+                        status=200 if ready else 503)
+
+
+# /health is for liveness and answers without touching anything. /ready is for the load
+# balancer and reports 503 while the database or cache is unreachable or migrations are
+# pending, see config.readiness.
+# Supports both sync and async so that under ASGI it does not force the whole middleware
+# chain back onto a worker thread
 class HealthCheckMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         if request.META["PATH_INFO"] == "/health":
             return HttpResponse("OK")
+        if request.META["PATH_INFO"] == "/ready":
+            return readiness_response()
 
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.META["PATH_INFO"] == "/health":
+            return HttpResponse("OK")
+        if request.META["PATH_INFO"] == "/ready":
+            # Waits on the checks, so off the event loop
+            return await sync_to_async(readiness_response, thread_sensitive=False)()
+
+        return await self.get_response(request)
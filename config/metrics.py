@@ -0,0 +1,211 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+
+from api.user_key_cache import get_user_key_cache
+
+from .compression_middleware import get_compression_stats
+from .postgresql_pool.base import get_pool_stats
+from .query_recorder import request_metrics
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PART_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return str(value)
+
+
+def format_labels(labels):
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+# A Prometheus histogram with one series per combination of label values. Counts per bucket
+# are kept uncumulated, so observing is a bisect and two additions under the lock.
+class Histogram:
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        with self._lock:
+            series = [(labels, list(counts), total)
+                      for labels, (counts, total) in self._series.items()]
+
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, counts, total in sorted(series):
+            labels = tuple(zip(self.labelnames, labels))
+            count = 0
+            for bucket, bucket_count in zip(self.buckets, counts):
+                count += bucket_count
+                lines.append(f'{self.name}_bucket'
+                             f'{format_labels(labels + (("le", format_value(bucket)),))} {count}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + 1
+
+    def expose(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in series:
+            lines.append(f'{self.name}{format_labels(tuple(zip(self.labelnames, labels)))} {value}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+LABELS = ('view', 'method')
+
+requests_total = Counter(
+    'keyfortress_requests_total', 'Requests by view, method and status, sampled or not.',
+    LABELS + ('status',))
+request_duration = Histogram(
+    'keyfortress_request_duration_seconds',
+    'Wall time from the request reaching the middleware until the response is ready. '
+    'Streamed responses are measured up to their first byte.',
+    LABELS, DURATION_BUCKETS)
+request_db_queries = Histogram(
+    'keyfortress_request_db_queries', 'Database queries per request.', LABELS, QUERY_BUCKETS)
+request_db_duration = Histogram(
+    'keyfortress_request_db_duration_seconds', 'Time per request spent in database queries.',
+    LABELS, PART_DURATION_BUCKETS)
+request_serializer_duration = Histogram(
+    'keyfortress_request_serializer_duration_seconds',
+    'Time per request spent validating, saving and representing data in serializers, not '
+    'counting the queries they make.',
+    LABELS, PART_DURATION_BUCKETS)
+response_size = Histogram(
+    'keyfortress_response_size_bytes', 'Response body size as sent, after compression. '
+    'Streamed responses are not observed.', LABELS, SIZE_BUCKETS)
+
+METRICS = [requests_total, request_duration, request_db_queries, request_db_duration,
+           request_serializer_duration, response_size]
+
+
+def reset_metrics():
+    for metric in METRICS:
+        metric.clear()
+
+
+# What is measured of the sampled request being handled, kept in query_recorder.request_metrics
+class RequestMetrics:
+    __slots__ = ('db_queries', 'db_seconds', 'serializer_seconds', 'serializing')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+
+
+# Adds the time spent in the block to the request's serializer time, less the time of any queries
+# run meanwhile, such as a lazy queryset evaluated by the serializer. Nested blocks count once.
+@contextmanager
+def measure_serialization():
+    metrics = request_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+
+    metrics.serializing = True
+    start, db_seconds = perf_counter(), metrics.db_seconds
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        metrics.serializer_seconds += perf_counter() - start - (metrics.db_seconds - db_seconds)
+
+
+def stats_lines(name, documentation, metric_type, samples):
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        lines.append(f'{name}{format_labels(labels)} {value}')
+    return lines
+
+
+# The Prometheus text exposition of this process' metrics, followed by the database pool,
+# user key cache and compression statistics
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+
+    pool_stats = {alias: get_pool_stats(alias) for alias in settings.DATABASES}
+    pool_stats = {alias: stats for alias, stats in pool_stats.items() if stats is not None}
+    for key in ('pool_size', 'pool_available', 'requests_waiting'):
+        lines.extend(stats_lines(
+            f'keyfortress_db_pool_{key}', f'psycopg pool {key}.', 'gauge',
+            [((('alias', alias),), stats.get(key, 0)) for alias, stats in pool_stats.items()]))
+    for key in ('requests_num', 'requests_queued', 'requests_errors'):
+        lines.extend(stats_lines(
+            f'keyfortress_db_pool_{key}_total', f'psycopg pool {key}.', 'counter',
+            [((('alias', alias),), stats[key]) for alias, stats in pool_stats.items()]))
+    lines.extend(stats_lines(
+        'keyfortress_db_pool_requests_wait_seconds_total',
+        'Time spent queued for a pool connection.', 'counter',
+        [((('alias', alias),), stats['requests_wait_ms'] / 1000)
+         for alias, stats in pool_stats.items()]))
+
+    user_key_stats = get_user_key_cache().stats()
+    lines.extend(stats_lines('keyfortress_user_key_cache_entries',
+                             'User keys held in this process.', 'gauge',
+                             [((), user_key_stats['entries'])]))
+    lines.extend(stats_lines('keyfortress_user_key_cache_lookups_total',
+                             'User key lookups by where they were answered from.', 'counter',
+                             [((('result', result),), user_key_stats[result])
+                              for result in ('local_hits', 'shared_hits', 'misses')]))
+
+    compression_stats = get_compression_stats()
+    for key in ('responses', 'raw_bytes', 'compressed_bytes', 'cpu_seconds'):
+        lines.extend(stats_lines(
+            f'keyfortress_compression_{key}_total', f'Compressed responses {key}.', 'counter',
+            [((('encoding', encoding),), stats[key])
+             for encoding, stats in sorted(compression_stats.items())]))
+
+    return '\n'.join(lines) + '\n'
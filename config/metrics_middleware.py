@@ -0,0 +1,103 @@
+import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .metrics import RequestMetrics, render_metrics, request_db_duration, request_db_queries, \
+    request_duration, request_serializer_duration, requests_total, response_size
+from .query_recorder import install, request_metrics
+
+
+# Whether the request may read metrics and reports, see METRICS_TOKEN. Nobody may without one.
+def scrape_allowed(request):
+    return bool(settings.METRICS_TOKEN) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {settings.METRICS_TOKEN}')
+
+
+def metrics_response(request):
+    if not scrape_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Labelled with the DRF view and action, such as vault_item-list, which is the URL name
+def get_labels(request):
+    view = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+    return view, request.method
+
+
+# Records, for METRICS_SAMPLE_RATE of the requests, the wall time, database queries and their
+# time, serializer time and response size as histograms per view, and counts every request.
+# They are served in the Prometheus text format on METRICS_PATH, see config.metrics. Each process
+# keeps its own, so scrape each worker. Scrapes must send METRICS_TOKEN, and are refused while it is
+# not set. Without METRICS_ENABLED the middleware removes itself and database connections are left
+# uninstrumented.
+# Must come before CompressionMiddleware so the size is that of the body as sent.
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+        install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if request.META['PATH_INFO'] == settings.METRICS_PATH:
+            return metrics_response(request)
+        if not self.sampled():
+            response = self.get_response(request)
+            requests_total.inc(get_labels(request) + (response.status_code,))
+            return response
+
+        metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+        self.observe(request, response, metrics, perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if request.META['PATH_INFO'] == settings.METRICS_PATH:
+            return metrics_response(request)
+        if not self.sampled():
+            response = await self.get_response(request)
+            requests_total.inc(get_labels(request) + (response.status_code,))
+            return response
+
+        metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+        self.observe(request, response, metrics, perf_counter() - start)
+        return response
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def observe(self, request, response, metrics, seconds):
+        labels = get_labels(request)
+        requests_total.inc(labels + (response.status_code,))
+        request_duration.observe(labels, seconds)
+        request_db_queries.observe(labels, metrics.db_queries)
+        request_db_duration.observe(labels, metrics.db_seconds)
+        request_serializer_duration.observe(labels, metrics.serializer_seconds)
+        if not response.streaming:
+            response_size.observe(labels, len(response.content))
@@ -0,0 +1,109 @@
+from threading import Lock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgreSQLDatabaseWrapper
+from django.db.utils import DEFAULT_DB_ALIAS
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+from .creation import DatabaseCreation
+
+# One pool per database alias, shared by every thread of the process
+_pools = {}
+_pools_lock = Lock()
+
+
+# Returns the pool statistics of a database alias, or None when it has no pool yet.
+# requests_wait_ms is the total time callers spent queued for a connection.
+def get_pool_stats(alias=DEFAULT_DB_ALIAS):
+    pool = _pools.get(alias)
+    if pool is None:
+        return None
+
+    stats = {'requests_num': 0, 'requests_queued': 0, 'requests_wait_ms': 0, 'requests_errors': 0,
+             **pool.get_stats()}
+    stats['requests_wait_ms_avg'] = stats['requests_wait_ms'] / stats['requests_num'] \
+        if stats['requests_num'] else 0
+    return stats
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    # The stock PostgreSQL backend, but connections are checked out from an in-process psycopg
+    # pool configured by OPTIONS['pool'] instead of being opened and closed per request.
+    # Closing the Django connection returns it to the pool. Without OPTIONS['pool'] this
+    # behaves exactly like django.db.backends.postgresql.
+    creation_class = DatabaseCreation
+
+    @property
+    def pool_options(self):
+        if self.alias == NO_DB_ALIAS:
+            return None
+        return self.settings_dict['OPTIONS'].get('pool')
+
+    def check_settings(self):
+        super().check_settings()
+        if self.pool_options and self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured(
+                'Pooled connections cannot be persistent, set CONN_MAX_AGE to 0.')
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    # Built lazily and rebuilt if the connection parameters change, e.g. when the test runner
+    # switches to the test database
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is not None and pool.kwargs != conn_params:
+                pool.close()
+                pool = None
+            if pool is None:
+                options = dict(self.pool_options)
+                pool = ConnectionPool(
+                    kwargs=conn_params,
+                    open=False,
+                    check=ConnectionPool.check_connection
+                    if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                    name=self.alias,
+                    **options,
+                )
+                pool.open()
+                _pools[self.alias] = pool
+            return pool
+
+    def close_pool(self):
+        with _pools_lock:
+            pool = _pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_options:
+            return super().get_new_connection(conn_params)
+
+        connection = self.get_pool(conn_params).getconn()
+        # Same isolation level handling as the stock backend
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        if isolation_level is None:
+            self.isolation_level = IsolationLevel.READ_COMMITTED
+        else:
+            try:
+                self.isolation_level = IsolationLevel(isolation_level)
+            except ValueError:
+                raise ImproperlyConfigured(
+                    f'Invalid transaction isolation level {isolation_level} '
+                    f'specified. Use one of the psycopg.IsolationLevel values.'
+                )
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None or not self.pool_options:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            self.connection._pool.putconn(self.connection)
+            self.connection = None
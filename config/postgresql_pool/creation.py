@@ -0,0 +1,9 @@
+from django.db.backends.postgresql.creation import DatabaseCreation as PostgreSQLDatabaseCreation
+
+
+class DatabaseCreation(PostgreSQLDatabaseCreation):
+
+    # Pooled connections to the test database would keep it from being dropped
+    def _destroy_test_db(self, test_database_name, verbosity):
+        self.connection.close_pool()
+        super()._destroy_test_db(test_database_name, verbosity)
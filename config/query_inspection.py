@@ -0,0 +1,141 @@
+import logging
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .query_recorder import install, query_log
+
+logger = logging.getLogger(__name__)
+
+# What varies between queries of the same shape. Django passes parameters separately, so mostly
+# the number of placeholders in IN () lists and VALUES, plus savepoint names and any literals.
+SHAPE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '%s'),
+    (re.compile(r'(?<![\w"])\d+(?:\.\d+)?\b'), '%s'),
+    (re.compile(r'"s\w+_x\w+"'), '"savepoint"'),
+    (re.compile(r'%s(?:\s*,\s*%s)+'), '%s, ...'),
+    (re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+'), r'\1'),
+]
+
+
+# The query with its parameters and the sizes of lists of parameters taken out, so that the
+# queries an N+1 repeats per row share a shape
+def query_shape(sql):
+    for pattern, replacement in SHAPE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+# The queries run in a capture_queries() block, and in any it is nested in
+class QueryLog:
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def record(self, sql, seconds):
+        log = self
+        while log is not None:
+            log.queries.append((sql, seconds))
+            log = log.parent
+
+    @property
+    def seconds(self):
+        return sum(seconds for sql, seconds in self.queries)
+
+    def shapes(self):
+        return Counter(query_shape(sql) for sql, seconds in self.queries)
+
+    # Shapes run at least threshold times, with how many times
+    def repeated(self, threshold):
+        return {shape: count for shape, count in self.shapes().most_common() if count >= threshold}
+
+    # Shapes of the queries that took at least this many seconds, with the longest time of each
+    def slow(self, seconds):
+        slow = {}
+        for sql, query_seconds in self.queries:
+            if query_seconds >= seconds:
+                shape = query_shape(sql)
+                slow[shape] = max(slow.get(shape, 0), query_seconds)
+        return slow
+
+
+# Records the queries run in the block, including those of sync_to_async threads it awaits, in
+# the QueryLog it yields
+@contextmanager
+def capture_queries():
+    install()
+    log = QueryLog(parent=query_log.get())
+    token = query_log.set(log)
+    try:
+        yield log
+    finally:
+        query_log.reset(token)
+
+
+_report = {}
+_report_lock = threading.Lock()
+
+
+def add_to_report(endpoint, log, repeated, slow):
+    with _report_lock:
+        report = _report.setdefault(endpoint, {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'db_seconds': 0.0,
+            'repeated': {}, 'slow': {}})
+        report['requests'] += 1
+        report['queries'] += len(log)
+        report['max_queries'] = max(report['max_queries'], len(log))
+        report['db_seconds'] += log.seconds
+        for shape, count in repeated.items():
+            report['repeated'][shape] = max(report['repeated'].get(shape, 0), count)
+        for shape, seconds in slow.items():
+            report['slow'][shape] = max(report['slow'].get(shape, 0), seconds)
+
+
+# Adds the queries of a request to the report, and logs a warning for each query shape it repeated
+# QUERY_INSPECTION_REPEAT_THRESHOLD times or more, the usual sign of an N+1, and for each taking
+# QUERY_INSPECTION_SLOW_MS or more. Only shapes are logged, never parameters.
+def inspect(endpoint, log):
+    repeated = log.repeated(settings.QUERY_INSPECTION_REPEAT_THRESHOLD)
+    slow = log.slow(settings.QUERY_INSPECTION_SLOW_MS / 1000)
+    add_to_report(endpoint, log, repeated, slow)
+
+    for shape, count in repeated.items():
+        logger.warning('%s ran the same query %d times out of %d: %s',
+                       endpoint, count, len(log), shape)
+    for shape, seconds in slow.items():
+        logger.warning('%s ran a query taking %.0f ms: %s', endpoint, seconds * 1000, shape)
+
+
+# Per endpoint, such as 'GET vault_item-list', the requests seen by QueryInspectionMiddleware in
+# this process, their queries, the most any one of them ran, and the most times any one request
+# repeated each flagged shape or the longest each slow shape took
+def get_query_report():
+    with _report_lock:
+        return {endpoint: {**report, 'repeated': dict(report['repeated']),
+                           'slow': dict(report['slow'])}
+                for endpoint, report in _report.items()}
+
+
+def reset_query_report():
+    with _report_lock:
+        _report.clear()
+
+
+def format_query_report(report):
+    lines = [f'{"Endpoint":<40} {"Requests":>8} {"Queries":>8} {"Max":>5} {"Avg ms":>8}']
+    for endpoint, stats in sorted(report.items()):
+        lines.append(f'{endpoint:<40} {stats["requests"]:>8} {stats["queries"]:>8} '
+                     f'{stats["max_queries"]:>5} '
+                     f'{stats["db_seconds"] * 1000 / stats["requests"]:>8.1f}')
+        for shape, count in stats['repeated'].items():
+            lines.append(f'    repeated {count} times: {shape}')
+        for shape, seconds in stats['slow'].items():
+            lines.append(f'    slow, {seconds * 1000:.0f} ms: {shape}')
+    return '\n'.join(lines)
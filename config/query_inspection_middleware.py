@@ -0,0 +1,57 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponseForbidden, JsonResponse
+
+from .metrics_middleware import get_labels, scrape_allowed
+from .query_inspection import capture_queries, get_query_report, inspect
+from .query_recorder import install
+
+
+def query_report_response(request):
+    if not scrape_allowed(request):
+        return HttpResponseForbidden()
+    return JsonResponse(get_query_report())
+
+
+# For staging, and for test runs with QUERY_INSPECTION_ENABLED. Captures the SQL each request
+# runs and flags repeated and slow query shapes, see config.query_inspection.inspect(). The per
+# endpoint report is served as JSON on /query_report, readable like /metrics, and printed at the
+# end of test runs.
+# Queries run while a streamed response is being sent are not captured.
+class QueryInspectionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if request.META['PATH_INFO'] == '/query_report':
+            return query_report_response(request)
+
+        with capture_queries() as log:
+            response = self.get_response(request)
+        self.inspect(request, log)
+        return response
+
+    async def __acall__(self, request):
+        if request.META['PATH_INFO'] == '/query_report':
+            return query_report_response(request)
+
+        with capture_queries() as log:
+            response = await self.get_response(request)
+        self.inspect(request, log)
+        return response
+
+    def inspect(self, request, log):
+        view, method = get_labels(request)
+        inspect(f'{method} {view}', log)
@@ -0,0 +1,44 @@
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# The RequestMetrics of the sampled request being handled, see config.metrics
+request_metrics = ContextVar('request_metrics', default=None)
+# The innermost QueryLog being captured, see config.query_inspection
+query_log = ContextVar('query_log', default=None)
+
+
+# Database execute wrapper shared by metrics and query inspection, timing each query for
+# whichever of them is recording. Otherwise it only looks up the context variables. They follow
+# the request into sync_to_async threads, so queries made there are recorded too.
+def record_query(execute, sql, params, many, context):
+    metrics = request_metrics.get()
+    log = query_log.get()
+    if metrics is None and log is None:
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = perf_counter() - start
+        if metrics is not None:
+            metrics.db_queries += 1
+            metrics.db_seconds += seconds
+        if log is not None:
+            log.record(sql, seconds)
+
+
+def install_query_recorder(connection, **kwargs):
+    # connection_created is sent on every reconnect of the same wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Instruments connections made from now on, and those this thread already has
+def install():
+    connection_created.connect(install_query_recorder, dispatch_uid='query_recorder')
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
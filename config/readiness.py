@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class NotReady(Exception):
+    # Its message is reported as the check's status
+    pass
+
+
+# Each check runs on its own thread, so uses and then closes that thread's connection
+def check_database():
+    connection = connections[DEFAULT_DB_ALIAS]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        connection.close()
+
+
+# Each check uses a key of its own, so concurrent checks of other processes sharing the cache
+# cannot overwrite the value before it is read back
+def check_caches():
+    for alias in settings.CACHES:
+        key = f'readiness_check:{uuid4().hex}'
+        caches[alias].set(key, 'ok', 10)
+        try:
+            if caches[alias].get(key) != 'ok':
+                raise NotReady('failed')
+        finally:
+            caches[alias].delete(key)
+
+
+def check_migrations():
+    connection = connections[DEFAULT_DB_ALIAS]
+    try:
+        executor = MigrationExecutor(connection)
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            raise NotReady('unapplied')
+    finally:
+        connection.close()
+
+
+CHECKS = {
+    'database': check_database,
+    'cache': check_caches,
+    'migrations': check_migrations,
+}
+
+
+class Readiness:
+    # Runs the checks in parallel, giving them READINESS_TIMEOUT seconds altogether, and keeps
+    # the result for READINESS_CACHE_SECONDS. Probes arriving meanwhile get the kept result, so
+    # however often the load balancer asks, each process checks at most once per period.
+    # A check that is still stuck from an earlier run is reported as timing out rather than
+    # started again, so hanging checks cannot pile up threads.
+
+    def __init__(self, timeout, cache_seconds):
+        self.timeout = timeout
+        self.cache_seconds = cache_seconds
+        self._executor = ThreadPoolExecutor(max_workers=len(CHECKS),
+                                            thread_name_prefix='readiness')
+        self._lock = threading.Lock()
+        self._running = {}
+        self._result = None
+        self._expires = 0
+
+    # Returns whether the app is ready and the status of each check
+    def get(self):
+        with self._lock:
+            if self._result is None or self._expires <= time.monotonic():
+                self._result = self.check()
+                self._expires = time.monotonic() + self.cache_seconds
+            return self._result
+
+    def check(self):
+        for name, check in CHECKS.items():
+            if name not in self._running or self._running[name].done():
+                self._running[name] = self._executor.submit(check)
+        wait(self._running.values(), timeout=self.timeout)
+
+        checks = {}
+        for name, future in self._running.items():
+            if not future.done():
+                checks[name] = 'timeout'
+            elif isinstance(future.exception(), NotReady):
+                checks[name] = str(future.exception())
+            elif future.exception() is not None:
+                logger.error('Readiness check %s failed', name, exc_info=future.exception())
+                checks[name] = 'failed'
+            else:
+                checks[name] = 'ok'
+        return all(status == 'ok' for status in checks.values()), checks
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_readiness = None
+_readiness_lock = threading.Lock()
+
+
+def get_readiness():
+    global _readiness
+    if _readiness is None:
+        with _readiness_lock:
+            if _readiness is None:
+                _readiness = Readiness(settings.READINESS_TIMEOUT, settings.READINESS_CACHE_SECONDS)
+    return _readiness
+
+
+@receiver(setting_changed)
+def reset_readiness(setting, **kwargs):
+    global _readiness
+    if setting.startswith('READINESS_') and _readiness is not None:
+        with _readiness_lock:
+            _readiness.shutdown()
+            _readiness = None
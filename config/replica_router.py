@@ -0,0 +1,107 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Set for the duration of a request whose reads may be served by a replica
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def get_pin_cache():
+    return caches[settings.DATABASE_REPLICA_PIN_CACHE_ALIAS]
+
+
+def get_pin_key(user_id):
+    return f'primary_pin_{user_id}'
+
+
+class ReplicaRouter:
+    # Sends reads to a random replica from settings.DATABASE_REPLICAS while the current request
+    # allows it, and everything else to the primary. Migrations only run on the primary, the
+    # replicas receive them through replication.
+
+    def db_for_read(self, model, **hints):
+        if read_from_replica.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    # The replicas hold the same rows as the primary
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+# Lets safe requests read from a replica. Replication lags behind the primary, so a user who
+# just wrote would not see their own write there: after an unsafe request the user's reads are
+# pinned to the primary for DATABASE_REPLICA_PIN_SECONDS, on every device, by a key in
+# DATABASE_REPLICA_PIN_CACHE_ALIAS, which must be shared by all workers. The user is taken from
+# the session, which is read from the primary, so this must come after SessionMiddleware.
+# Anonymous safe requests always read from a replica.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        can_read_from_replica = request.method in SAFE_METHODS
+        if can_read_from_replica:
+            user_id = request.session.get(SESSION_KEY)
+            can_read_from_replica = user_id is None or \
+                get_pin_cache().get(get_pin_key(user_id)) is None
+
+        token = read_from_replica.set(can_read_from_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        if request.method not in SAFE_METHODS:
+            self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        can_read_from_replica = request.method in SAFE_METHODS
+        if can_read_from_replica:
+            # Session backends have no async API in Django 4.2
+            user_id = await sync_to_async(request.session.get)(SESSION_KEY)
+            can_read_from_replica = user_id is None or \
+                await get_pin_cache().aget(get_pin_key(user_id)) is None
+
+        token = read_from_replica.set(can_read_from_replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(self.pin)(request)
+        return response
+
+    # Pins the user the session belongs to after the request, so also the one who just logged in
+    def pin(self, request):
+        user_id = request.session.get(SESSION_KEY)
+        if user_id is not None:
+            get_pin_cache().set(get_pin_key(user_id), True,
+                                settings.DATABASE_REPLICA_PIN_SECONDS)
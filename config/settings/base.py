@@ -42,9 +42,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'config.health_check_middleware.HealthCheckMiddleware',
+    'config.metrics_middleware.MetricsMiddleware',
+    'config.query_inspection_middleware.QueryInspectionMiddleware',
+    'config.compression_middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'config.replica_router.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -52,17 +56,76 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# JSON responses of at least COMPRESSION_MIN_SIZE bytes, and streamed ones, are compressed with
+# the first of COMPRESSION_ENCODINGS the client accepts. br and zstd need the optional brotli and
+# zstandard packages and are skipped without them. Set COMPRESSION_ENCODINGS to '' to turn
+# compression off. Levels run from 1 to 9 for gzip, 0 to 11 for br and 1 to 22 for zstd.
+COMPRESSION_ENCODINGS = list(filter(
+    None, os.environ.get('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',')))
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVELS = {
+    'gzip': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+    'br': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4)),
+    'zstd': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # orjson based, with the same output as DRF's JSON renderer and parser
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Login and signup attempts allowed per client IP address and per email address,
+    # as count/s, /m, /h or /d. See THROTTLE_CACHE_ALIAS.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP_RATE', '30/m'),
+        'login_email': os.environ.get('THROTTLE_LOGIN_EMAIL_RATE', '10/h'),
+        'signup_ip': os.environ.get('THROTTLE_SIGNUP_IP_RATE', '5/d'),
+        'signup_email': os.environ.get('THROTTLE_SIGNUP_EMAIL_RATE', '5/h'),
+    },
+    # Proxies in front of the app, so throttles take the client IP from X-Forwarded-For
+    'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if 'NUM_PROXIES' in os.environ else None,
 }
 
 ROOT_URLCONF = 'config.urls'
 
+# /ready checks the database, the caches and migrations within READINESS_TIMEOUT seconds and
+# keeps the result for READINESS_CACHE_SECONDS, so frequent probes do not add load
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', 2))
+READINESS_CACHE_SECONDS = float(os.environ.get('READINESS_CACHE_SECONDS', 5))
+
+# Per view request metrics in the Prometheus text format on METRICS_PATH, recorded for
+# METRICS_SAMPLE_RATE of the requests. Scrapes must send METRICS_TOKEN as a bearer token, and are
+# refused while it is empty. Off by default, and then nothing is measured.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1))
+METRICS_PATH = os.environ.get('METRICS_PATH', '/metrics')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Captures the queries of every request and logs query shapes a request repeats
+# QUERY_INSPECTION_REPEAT_THRESHOLD times or more, a likely N+1, and queries taking
+# QUERY_INSPECTION_SLOW_MS or more. For staging and test runs, not production.
+QUERY_INSPECTION_ENABLED = os.environ.get('QUERY_INSPECTION_ENABLED', 'False') == 'True'
+QUERY_INSPECTION_REPEAT_THRESHOLD = int(os.environ.get('QUERY_INSPECTION_REPEAT_THRESHOLD', 5))
+QUERY_INSPECTION_SLOW_MS = float(os.environ.get('QUERY_INSPECTION_SLOW_MS', 100))
+
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
+# Serve the hot GET endpoints (user_key, vault_items, vault_collections) from native async
+# views. Only worth turning on when running under ASGI, see "Running under ASGI" in the README.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True'
+
 
 TEMPLATES = [
     {
@@ -94,9 +157,125 @@ DATABASES = {
         'PASSWORD': os.environ['DATABASE_PASSWORD'],
         'HOST': os.environ['DATABASE_HOST'],
         'PORT': os.environ['DATABASE_PORT'],
+        # Seconds a connection is kept open for reuse by later requests, 0 closes it after each
+        # request. With health checks on, a reused connection is tested before use.
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DATABASE_CONN_HEALTH_CHECKS', 'False') == 'True',
     }
 }
 
+# Alternatively check connections out of a per-process psycopg pool. DATABASE_POOL_SIZE
+# connections are kept open and up to DATABASE_POOL_MAX_OVERFLOW more are opened under load,
+# then closed again after DATABASE_POOL_MAX_IDLE seconds unused. A request that cannot get a
+# connection within DATABASE_POOL_TIMEOUT seconds fails. Requires DATABASE_CONN_MAX_AGE=0.
+if os.environ.get('DATABASE_POOL', 'False') == 'True':
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 4))
+    DATABASES['default']['ENGINE'] = 'config.postgresql_pool'
+    DATABASES['default']['OPTIONS'] = {'pool': {
+        'min_size': DATABASE_POOL_SIZE,
+        'max_size': DATABASE_POOL_SIZE + int(os.environ.get('DATABASE_POOL_MAX_OVERFLOW', 6)),
+        'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+        'max_idle': float(os.environ.get('DATABASE_POOL_MAX_IDLE', 600)),
+    }}
+
+# Read replicas, as comma-separated host[:port] of PostgreSQL replicas of the default database
+# reached with the same name and credentials. Safe requests read from a random replica unless
+# the user wrote within the last DATABASE_REPLICA_PIN_SECONDS, so users see their own writes.
+# The pins are kept in DATABASE_REPLICA_PIN_CACHE_ALIAS, which must be shared by all workers.
+DATABASE_REPLICAS = []
+replica_hosts = os.environ.get('DATABASE_REPLICA_HOSTS', '')
+for index, replica_host in enumerate(filter(None, replica_hosts.split(','))):
+    host, _, port = replica_host.strip().partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['config.replica_router.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 10))
+DATABASE_REPLICA_PIN_CACHE_ALIAS = os.environ.get('DATABASE_REPLICA_PIN_CACHE_ALIAS', 'default')
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Defaults to a per-process cache. Point CACHE_BACKEND/CACHE_LOCATION at a shared cache
+# (e.g. django.core.cache.backends.redis.RedisCache) when running more than one worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Throttle counters are kept in this cache. Use a cache shared by all workers, a per-process
+# cache lets each worker allow the full rate.
+THROTTLE_CACHE_ALIAS = os.environ.get('THROTTLE_CACHE_ALIAS', 'default')
+
+# Logins for an email address, or from an IP address, are rejected without hashing the password
+# once they failed this many times within LOGIN_FAILURE_TIMEOUT seconds of the first failure
+LOGIN_FAILURE_EMAIL_LIMIT = int(os.environ.get('LOGIN_FAILURE_EMAIL_LIMIT', 5))
+LOGIN_FAILURE_IP_LIMIT = int(os.environ.get('LOGIN_FAILURE_IP_LIMIT', 20))
+LOGIN_FAILURE_TIMEOUT = int(os.environ.get('LOGIN_FAILURE_TIMEOUT', 900))
+
+
+# Sessions
+# https://docs.djangoproject.com/en/4.2/topics/http/sessions/#configuring-sessions
+# Set SESSION_ENGINE=django.contrib.sessions.backends.cached_db to serve session reads from
+# the cache while the database stays the durable copy. Only do so with a shared cache:
+# a per-process cache would keep serving a session that another worker logged out.
+# Run `manage.py warm_session_cache` after switching so existing sessions start as cache hits.
+
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = os.environ.get('SESSION_CACHE_ALIAS', 'default')
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+# New passwords are hashed with the first hasher. The others are only used to verify existing
+# hashes, which are rehashed with the first hasher on the user's next successful login.
+# The tunable hashers keep Django's algorithm names, so they also verify hashes made by
+# Django's own Argon2 and PBKDF2 hashers.
+# Measure the configured cost with `python manage.py benchmark_password_hashers`.
+
+PASSWORD_HASHERS = os.environ.get('PASSWORD_HASHERS', ','.join([
+    'api.hashers.TunableArgon2PasswordHasher',
+    'api.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+])).split(',')
+
+# Defaults follow the OWASP Argon2id baseline (19 MiB, 2 iterations, 1 lane)
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+
+# Login and signup hash on a bounded per-process thread pool. When all workers are busy and
+# the queue is full, or a hash waits longer than the timeout (seconds), the request gets a 503.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE_DEPTH = int(os.environ.get('PASSWORD_HASHING_QUEUE_DEPTH', 8))
+PASSWORD_HASHING_TIMEOUT = float(os.environ.get('PASSWORD_HASHING_TIMEOUT', 5))
+
+AUTHENTICATION_BACKENDS = ['api.backends.PooledModelBackend']
+
+# UserKeys are cached per process for USER_KEY_CACHE_LOCAL_TIMEOUT seconds (at most
+# USER_KEY_CACHE_MAX_ENTRIES of them) in front of the default cache, where they are kept for
+# USER_KEY_CACHE_TIMEOUT seconds. Changes are only seen by other processes once their local
+# copy expires, so keep the local timeout short. When the default cache is per process, such as
+# the default LocMemCache, shared entries are not kept longer than local ones either.
+USER_KEY_CACHE_MAX_ENTRIES = int(os.environ.get('USER_KEY_CACHE_MAX_ENTRIES', 10000))
+USER_KEY_CACHE_TIMEOUT = int(os.environ.get('USER_KEY_CACHE_TIMEOUT', 3600))
+USER_KEY_CACHE_LOCAL_TIMEOUT = int(os.environ.get('USER_KEY_CACHE_LOCAL_TIMEOUT', 30))
+
+# Deletions are kept for sync clients this many days. Older ones are removed by the
+# prune_tombstones command, and clients whose cursor is from before them must sync again from scratch.
+VAULT_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('VAULT_TOMBSTONE_RETENTION_DAYS', 90))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -144,6 +323,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Lets browser clients read the pagination and ETag headers on cross-origin responses
+CORS_EXPOSE_HEADERS = ['ETag', 'Link', 'X-Next-Cursor']
+
 CSRF_COOKIE_SAMESITE = 'Lax'
 
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .query_inspection import format_query_report, get_query_report
+
+UNLIMITED_RATE = '1000000/s'
+
+
+# The default runner, which with QUERY_INSPECTION_ENABLED logs the per endpoint query report of
+# all the requests the tests made, see config.query_inspection_middleware.
+# The login and signup throttles count attempts in the cache, which outlives each test, so their
+# limits are lifted for the whole run. Tests of the throttles set their own.
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        rates = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+        self.throttle_settings = override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                            'DEFAULT_THROTTLE_RATES': dict.fromkeys(rates, UNLIMITED_RATE)},
+            LOGIN_FAILURE_EMAIL_LIMIT=1000000, LOGIN_FAILURE_IP_LIMIT=1000000)
+        self.throttle_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        if settings.QUERY_INSPECTION_ENABLED and get_query_report():
+            self.log(f'\nQueries per endpoint\n{format_query_report(get_query_report())}')
+        return result